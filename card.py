@@ -1,25 +1,68 @@
 import tkinter as tk
 from PIL import Image, ImageTk
-import os, random, math, time
+from card_deck import DeckError, load_deck, scan_deck
+from card_latency import LatencyProbe, key_name
+from card_layout import LAYOUTS, arrange
+from card_log import log
+from card_model import Board, History
+from card_remote import RemoteServer
+from card_render import make_canvas
+from card_routine import RoutinePlayer, RoutineError, load_routine
+from card_scheduler import EFFECT, FrameScheduler
+from card_stack import SORTS, build_indexes, card_rank
+from concurrent.futures import ThreadPoolExecutor
+import card_cache
+import os, random, math, time, queue, subprocess, sys, threading, traceback
 
 BG_COLOR = "#000000"
 CARD_FOLDER = "image/card"
+DISPLAY_SCALE = None  # None = from the monitor DPI
 CARD_SIZE = (74, 111)
 BOX_SIZE = (80, 120)
 SPREAD_SPACING = 20
 LIST_SPACING = 100
+LAYOUT_FRAMES = 20
 WAVE_WIDTH = 100
 WAVE_HEIGHT = 15
 NO_WAVE_RANGE = 60
+FLATTEN_DELAY = 300
+REMOTE_CONTROL = True
+ROUTINE_FILE = "routine.txt"
+FIT_WINDOW = False
+FIT_MARGIN = 100
+FIT_DELAY = 500
+MEMORIZED_STACK = "si_stebbins"
+HISTORY_SIZE = 50
+RENDERER = os.environ.get("CARD_RENDERER", "tk")  # "tk" or "soft"
+DECK_MANIFEST = os.environ.get("CARD_DECK", "deck.json")
 
 focus_box = None
 focus_group = None
 focus_card = None
 list_card = None
-swap_target_name = None
+pressed_item = None
+routine_player = None
+query_digits = None
+stack_indexes = {}
+window_box = [0, 0, 0, 0]
+fit_job = None
+callback_errors = 0
+
+image_jobs = {}
+image_cache = {}
+pil_images = {}
+image_names = {}
+flip_jobs = {}
+flip_cache = {}
+rotated_cache = {}
+rotate_jobs = {}
+ready_images = queue.Queue()
+preload_pool = ThreadPoolExecutor()
 
 
 class Drag:
+    items = {}
+
     def __init__(self, canva, x, y, item_id, w=None, h=None):
         self.canva = canva
         self.item_id = item_id
@@ -30,19 +73,16 @@ class Drag:
         self.draggable = True
         self.w = w
         self.h = h
+        self.size = (0, 0)
+        Drag.items[self.item_id] = self
 
-        for btn in ("<Button-1>", "<Button-2>", "<Button-3>"):
-            self.canva.tag_bind(self.item_id, btn, self._set_focus)
+    def unregister(self):
+        Drag.items.pop(self.item_id, None)
 
-        self.canva.tag_bind(self.item_id, "<Button-1>", self._start_drag, add="+")
-        self.canva.tag_bind(self.item_id, "<B1-Motion>", self._on_drag)
-        self.canva.tag_bind(self.item_id, "<ButtonRelease-1>", self._stop_drag)
-        self.canva.tag_bind(
-            self.item_id, "<Button-2>", lambda e: self.middle_click(e), add="+"
-        )
-        self.canva.tag_bind(
-            self.item_id, "<Button-3>", lambda e: self.right_click(e), add="+"
-        )
+    def extent(self):
+        w, h = self.size
+        x, y = self.item_x - w / 2, self.item_y - h / 2
+        return x, y, x + w, y + h
 
     def _set_focus(self, event=None):
         global focus_box, focus_group, focus_card, list_card
@@ -63,6 +103,7 @@ class Drag:
     def _start_drag(self, event):
         self.start_x, self.start_y = event.x, event.y
         self.canva.tag_raise(self.item_id)
+        probe.changed()
 
     def _on_drag(self, event):
         if not self.draggable:
@@ -85,11 +126,13 @@ class Drag:
             self.item_y = y
             self.start_x, self.start_y = event.x, event.y
             self.dragged = True
+            reserve_window(*self.extent())
 
     def _stop_drag(self, event):
         if self.dragged:
             self.dragging(False)
             self.dragged = False
+            schedule_fit()
         else:
             self.left_click(event)
 
@@ -107,47 +150,66 @@ class Drag:
 
 
 class Box(Drag):
-    def __init__(self, canva, x, y, box_img, back_img, card_imgs_names):
+    def __init__(self, canva, x, y, box_img, back_img, board):
         global focus_box
         focus_box = self
 
         self.box_img = box_img
         self.this_box = canva.create_image(x, y, image=self.box_img, tags="box")
         super().__init__(canva, x, y, self.this_box)
+        self.size = BOX_SIZE
         self.initial_x, self.initial_y = x, y
         self.back_img = back_img
-        self.all_cards = set(card_imgs_names)
-        self.unused_card_names = set(card_imgs_names)
-        self.used_card = []
+        self.board = board
+        self.ranks = board.deck.rank_masks
         self.spreading = False
+        self.pending = 0
         self.list_card = None
 
         self.left_click = self.spawn_card
         self.middle_click = self.reset_position
         self.right_click = lambda e: self.spawn_spread(e, face_up=False)  # type: ignore
 
+    @property
+    def all_cards(self):
+        return self.board.all_cards
+
+    @property
+    def unused_card_names(self):
+        return self.board.unused
+
+    @property
+    def used_card(self):
+        return [Card.views[i] for i in self.board.cards if i in Card.views]
+
+    def card_named(self, card_name):
+        state = self.board.by_name.get(card_name)
+        return Card.views.get(state.id) if state else None
+
     def reset_position(self, event=None):
         self.item_x = self.initial_x
         self.item_y = self.initial_y
         self.canva.coords(self.item_id, self.item_x, self.item_y)
+        reserve_window(*self.extent())
+        schedule_fit()
 
     def spawn_card(self, event=None):
-        if self.spreading or not self.unused_card_names:
+        unused = self.unused_card_names
+        if self.spreading or not unused:
             no_card(canva, self.item_x, self.item_y - 25)
             return
 
-        card_name = random.choice(list(self.unused_card_names))
-        front_img = load_image(card_name, CARD_SIZE)
+        card_name = random.choice(unused)
+        x1, y1, x2, y2 = self.extent()
+        reserve_window(x1, y1 - 130, x2, y2)
         card = Card(
             self.canva,
             self,
             self.item_x,
             self.item_y,
             self.back_img,
-            front_img,
             card_name,
         )
-        self.take_card(card_name, card)
         self.canva.tag_raise(self.item_id)
         card.up()
 
@@ -159,20 +221,15 @@ class Box(Drag):
     def delete_card(self, targets):
         def delete_next(i):
             if i < len(targets):
-                if targets[i] in self.used_card:
-                    targets[i].delete(count=5)
+                if targets[i].state.id in self.board.cards:
+                    targets[i].delete(count=5, record=False)
                 self.canva.after(50, lambda i=i + 1: delete_next(i))
+            else:
+                self.pending -= 1
 
+        self.pending += 1
         delete_next(0)
 
-    def take_card(self, card_name, card):
-        self.unused_card_names.discard(card_name)
-        self.used_card.append(card)
-
-    def return_card(self, card_name, card):
-        self.unused_card_names.add(card_name)
-        self.used_card.remove(card)
-
     def spawn_spread(
         self,
         event=None,
@@ -183,32 +240,18 @@ class Box(Drag):
     ):
         if self.spreading:
             return
+        if sort not in SORTS:
+            log.warning("⚠️ Invalid sort option: %s", sort)
+            return
 
-        self.spreading = True
-
-        if delete_used:
-            from_group = self.all_cards.copy()
-        else:
-            from_group = self.unused_card_names.copy()
-
-        available = []
-        if group == "all":
-            available = list(from_group)
-        if group == "no_joker" or group == "black" or group == "spade":
-            available += [name for name in from_group if "spade" in name]
-        if group == "no_joker" or group == "black" or group == "club":
-            available += [name for name in from_group if "club" in name]
-        if group == "no_joker" or group == "red" or group == "diamond":
-            available += [name for name in from_group if "diamond" in name]
-        if group == "no_joker" or group == "red" or group == "heart":
-            available += [name for name in from_group if "heart" in name]
-
+        available = self.board.available(group, delete_used)
         if not available:
-            print("⚠️ All cards have been generated!")
+            log.warning("⚠️ All cards have been generated!")
             no_card(canva, self.item_x, self.item_y - 25)
-            self.spreading = False
             return
 
+        history.record()
+        self.spreading = True
         group = Group(self.canva, self, self.back_img, available, sort, face_up)
 
         global focus_box, focus_group, focus_card
@@ -217,83 +260,71 @@ class Box(Drag):
         focus_card = None
 
     def list_card_value(self, card_name, delete_used=True, face_up=True):
-        if delete_used:
-            from_group = self.all_cards.copy()
-        else:
-            from_group = self.unused_card_names.copy()
-
         global list_card
-        if "joker" in card_name:
-            if list_card == "joker":
-                return
-
-            list_card = "joker"
-            available = [name for name in from_group if "joker" in name]
-            available.sort()
-        else:
-            digits = "".join(ch for ch in card_name if ch.isdigit())
-            if digits == "" or list_card == digits:
-                return
-
-            list_card = digits
-            available = []
-            for name in from_group:
-                this_digits = "".join(ch for ch in name if ch.isdigit())
-                if digits == this_digits and "joker" not in name:
-                    available += [name]
+        rank = (
+            card_name
+            if card_name in self.ranks
+            else card_rank(self.board.deck, card_name)
+        )
+        if rank == "" or list_card == rank:
+            return
 
-            order = ["spade", "diamond", "club", "heart"]
-            available = sorted(
-                available, key=lambda n: order.index(next(s for s in order if s in n))
-            )
+        list_card = rank
+        available = self.board.available("all", delete_used, rank=rank)
 
         if not available:
-            print("⚠️ All cards have been generated!")
+            log.warning("⚠️ All cards have been generated!")
             return
 
+        history.record()
         n = len(available)
         screen_w = canva.winfo_width()
         screen_h = canva.winfo_height()
         total_width = CARD_SIZE[0] + (n - 1) * LIST_SPACING
+        left = (screen_w - total_width) / 2
+        top = screen_h / 2 - 95
+        reserve_window(left, top, left + total_width, top + CARD_SIZE[1])
+        places = arrange(
+            "ribbon",
+            n,
+            left + CARD_SIZE[0] / 2,
+            top + CARD_SIZE[1] / 2,
+            LIST_SPACING,
+            CARD_SIZE,
+        )
 
         def generate_next(step, w):
             if available:
                 card_name = available.pop(0)
-                if card_name not in self.unused_card_names:
-                    for c in self.used_card:
-                        if c.card_name == card_name:
-                            self.delete_card([c])
-                            print("🟩 Card deleted:", card_name)
-                            break
-
-                x = (
-                    (screen_w - total_width) / 2
-                    + CARD_SIZE[0] / 2
-                    + LIST_SPACING * step
-                )
-                y = screen_h / 2 + CARD_SIZE[1] / 2 - 95
+                existing = self.card_named(card_name)
+                if existing:
+                    self.delete_card([existing])
+                    log.debug("🟩 Card deleted: %s", card_name)
 
-                front_img = load_image(card_name, CARD_SIZE)
-                card = Card(
+                x, y, _ = places[step]
+                Card(
                     self.canva,
                     self,
                     x,
                     y,
                     self.back_img,
-                    front_img,
                     card_name,
                     face_up=face_up,
                 )
-                self.take_card(card_name, card)
                 self.canva.after(50, lambda s=step + 1: generate_next(s, w))
+            else:
+                self.pending -= 1
 
+        self.pending += 1
         generate_next(0, total_width)
 
 
 class Group(Drag):
     instances = []
+    views = {}
+    flat_items = {}
 
-    def __init__(self, canva, box, back_img, available, sort, face_up):
+    def __init__(self, canva, box, back_img, available, sort, face_up, state=None):
         n = len(available)
         screen_w = canva.winfo_width()
         screen_h = canva.winfo_height()
@@ -301,6 +332,8 @@ class Group(Drag):
         total_width = CARD_SIZE[0] + (n - 1) * SPREAD_SPACING
         x = (screen_w - total_width) / 2 - CARD_SIZE[0] / 2 + 2
         y = screen_h / 2 - CARD_SIZE[1] / 2 + 136
+        if state:
+            x, y = state.x, state.y
 
         self.w = CARD_SIZE[0] / 4
         self.h = CARD_SIZE[1]
@@ -309,23 +342,32 @@ class Group(Drag):
             y,
             x + self.w,
             y + self.h,
-            fill="#111111",
+            fill="#222222" if state else "#111111",
             outline="#444444",
             width=3,
             tags="group",
         )
+        reserve_window(x, y - WAVE_HEIGHT, x + 35 + total_width, y + self.h)
         self.box = box
+        self.state = state or box.board.create_group(available, sort, x, y)
         super().__init__(canva, x, y, self.this_group, self.w, self.h)
         Group.instances.append(self)
+        Group.views[self.state.id] = self
         self.back_img = back_img
         self.face_up = face_up
-        self.group_cards = []
-        self.spawning = True
+        self.spawning = state is None
         self.moving = False
         self.flipping = False
         self.stacking = False
-        self.stacked = False
+        self.arranging = False
+        self.collapsed = False
+        self.waving = False
+        self.resetting = False
+        self.flat_item = None
+        self.flat_img = None
+        self.settle_job = None
         self.drag_box = None
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
         self.set_target_card = 0
         self.target_suit = ""
 
@@ -333,106 +375,93 @@ class Group(Drag):
         self.middle_click = self.delete_group
         self.right_click = self.stack
 
-        def standard_stack(name):
-            if "joker-(1)" in name:
-                return (-1, -1)
-            if "joker-(2)" in name:
-                return (99, 99)
-
-            order = ["spade", "diamond", "club", "heart"]
-            suit = next(i for i, s in enumerate(order) if s in name)
-            digits = int("".join(ch for ch in name if ch.isdigit()))
-            return (suit, digits)
-
-        def si_stebbins_stack(name):
-            if "joker" in name:
-                return (99, 99)
-            order = ["club", "heart", "spade", "diamond"]
-            suit = next(i for i, s in enumerate(order) if s in name)
-            digits = int("".join(ch for ch in name if ch.isdigit()))
-            return ((14 - digits + suit * 3) % 13, suit)
-
-        def eight_kings_stack(name):
-            if "joker" in name:
-                return (99, 99)
-            suit_order = ["club", "heart", "spade", "diamond"]
-            number_order = [8, 13, 3, 10, 2, 7, 9, 5, 12, 4, 1, 6, 11]
-            suit = next(i for i, s in enumerate(suit_order) if s in name)
-            digits = int("".join(ch for ch in name if ch.isdigit()))
-            rank = number_order.index(digits)
-            new_suit = (suit - rank) % 4
-            return (new_suit, rank)
-
-        def mirror_stack(available, suit, rank):
-            available = random.sample(available.copy(), len(available))
-            color = {
-                "club": "spade",
-                "spade": "club",
-                "heart": "diamond",
-                "diamond": "heart",
-            }
-            number = {
-                "(1)": "(13)",
-                "(2)": "(12)",
-                "(3)": "(11)",
-                "(4)": "(10)",
-                "(5)": "(9)",
-                "(6)": "(8)",
-                "(7)": "(7)",
-                "(8)": "(6)",
-                "(9)": "(5)",
-                "(10)": "(4)",
-                "(11)": "(3)",
-                "(12)": "(2)",
-                "(13)": "(1)",
-            }
-            for i in range(len(available) // 2):
-                target = available[i]
-                if "joker" in target:
-                    target = "joker-(2).png" if "1" in target else "joker-(1).png"
-                else:
-                    if suit:
-                        for c in color:
-                            if c in target:
-                                target = target.replace(c, color[c])
-                                break
-                    if rank:
-                        for n in number:
-                            if n in target:
-                                target = target.replace(n, number[n])
-                                break
-
-                for j in range(i + 1, len(available)):
-                    if available[j] == target:
-                        available[j], available[len(available) // 2 + i] = (
-                            available[len(available) // 2 + i],
-                            available[j],
-                        )
-                        break
-            return available
-
-        if sort == "random":
-            self.available = random.sample(available.copy(), len(available))
-        elif sort == "standard":
-            self.available = sorted(available, key=standard_stack)
-        elif sort == "si_stebbins":
-            self.available = sorted(available, key=si_stebbins_stack)
-        elif sort == "eight_kings":
-            self.available = sorted(available, key=eight_kings_stack)
-        elif sort == "color_mirror":
-            self.available = mirror_stack(available, True, False)
-        elif sort == "number_mirror":
-            self.available = mirror_stack(available, False, True)
-        elif sort == "color_number_mirror":
-            self.available = mirror_stack(available, True, True)
-        else:
-            print("⚠️ Invalid sort option:", sort)
+        self.available = [] if state else list(self.state.order)
+        if not state:
+            self.spread()
+
+    @property
+    def item_x(self):
+        return self.state.x
+
+    @item_x.setter
+    def item_x(self, value):
+        self.state.x = value
+
+    @property
+    def item_y(self):
+        return self.state.y
+
+    @item_y.setter
+    def item_y(self, value):
+        self.state.y = value
+
+    def layout_targets(self, n=None):
+        return arrange(
+            self.state.layout,
+            len(self.group_cards) if n is None else n,
+            self.item_x + CARD_SIZE[0] / 2 + 35,
+            self.item_y + CARD_SIZE[1] / 2,
+            SPREAD_SPACING,
+            CARD_SIZE,
+        )
 
-        self.spread()
+    def prerotate(self, cards, targets, flip=False):
+        for card, (_, _, angle) in zip(cards, targets):
+            face_up = card.face_up != flip
+            rotate_async(card.front_img if face_up else card.back_img, angle)
+
+    def apply_angles(self, cards, targets):
+        for card, (_, _, angle) in zip(cards, targets):
+            if card.group is self:
+                self.box.board.set_angle(card.state, angle)
+
+    def measure(self):
+        # Full pass over the Python-side card positions, only after a
+        # re-layout or undo. Drags shift the bounds in place, motion frames
+        # rebuild them as they move each card, and spawns grow them (include).
+        cards = self.group_cards
+        if not cards:
+            self.bounds = [self.item_x, self.item_y, self.item_x, self.item_y]
+            return self.bounds
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+        for c in cards:
+            self.include(c.item_x, c.item_y, c.state.angle)
+        return self.bounds
+
+    def include(self, x, y, angle=0):
+        x1, y1, x2, y2 = card_box(x, y, angle)
+        b = self.bounds
+        b[0] = min(b[0], x1)
+        b[1] = min(b[1], y1)
+        b[2] = max(b[2], x2)
+        b[3] = max(b[3], y2)
+
+    def exclude(self, x, y, angle=0):
+        # Only a card on the edge can shrink the group.
+        x1, y1, x2, y2 = card_box(x, y, angle)
+        b = self.bounds
+        if x1 <= b[0] or y1 <= b[1] or x2 >= b[2] or y2 >= b[3]:
+            self.measure()
+
+    def extent(self):
+        x1, y1, x2, y2 = self.bounds
+        return min(x1, self.item_x), y1 - WAVE_HEIGHT, x2, y2
+
+    @property
+    def stacked(self):
+        return self.state.stacked
+
+    @property
+    def index(self):
+        return self.state.index
+
+    @property
+    def group_cards(self):
+        return [Card.views[i] for i in self.state.cards]
 
     def dragging(self, state):
-        global swap_target_name
         if state:
+            self.unflatten()
             for c in self.group_cards:
                 x = c.item_x + self.dx
                 y = c.item_y + self.dy
@@ -440,13 +469,12 @@ class Group(Drag):
                 c.item_x = x
                 c.item_y = y
 
-            x1, y1 = self.canva.coords(self.group_cards[0].this_card)
-            x2, y2 = self.canva.coords(self.group_cards[-1].this_card)
-
-            x1 -= CARD_SIZE[0] / 2
-            x2 += CARD_SIZE[0] / 2
-            y1 -= CARD_SIZE[1] / 2
-            y2 += CARD_SIZE[1] / 2
+            b = self.bounds
+            b[0] += self.dx
+            b[1] += self.dy
+            b[2] += self.dx
+            b[3] += self.dy
+            x1, y1, x2, y2 = b
 
             if self.drag_box == None:
                 self.drag_box = self.canva.create_rectangle(
@@ -466,12 +494,12 @@ class Group(Drag):
             self.canva.delete(self.drag_box)
             self.drag_box = None
 
-            print(f"🃏 {self.item_x}, {self.item_y}")
+            log.debug("🃏 %s, %s", self.item_x, self.item_y)
             if self.item_y < 335 and self.item_x < 295:
                 self.target_suit = ""
-                swap_target_name = None
+                self.box.board.target = None
                 self.set_target_card = 1
-                print("🟥 set_target_card")
+                log.debug("🟥 set_target_card")
 
             if self.set_target_card == 1:
                 up, down = 295, 610
@@ -489,7 +517,7 @@ class Group(Drag):
                     else:
                         self.target_suit = "heart"
                         self.set_target_card = 2
-                    print(self.target_suit)
+                    log.debug("%s", self.target_suit)
 
             if self.set_target_card == 2:
                 up, down = 455, 870
@@ -520,32 +548,31 @@ class Group(Drag):
                     else:
                         n += 3
 
-                    if n == 14:
-                        set_target("joker-(1).png")
-                    elif n == 15:
-                        set_target("joker-(2).png")
+                    if n > 13:
+                        name = deck.card("joker", "joker", n - 14)
                     else:
-                        set_target(self.target_suit + "-(" + str(n) + ").png")
+                        name = deck.card(self.target_suit, n)
+                    if name:
+                        set_target(name)
                     self.set_target_card = 0
-                    print(swap_target_name)
+                    log.debug("%s", self.box.board.target)
 
         self.moving = state
+        if not state:
+            self.settle()
 
     def spread(self):
+        targets = self.layout_targets(len(self.available))
+
         def generate_next(step):
             if self.available:
                 card_name = self.available.pop(0)  # type: ignore
-                if card_name not in self.box.unused_card_names:
-                    for c in self.box.used_card:
-                        if c.card_name == card_name:
-                            self.box.delete_card([c])
-                            print("🟩 Card deleted:", card_name)
-                            break
-
-                front_img = load_image(card_name, CARD_SIZE)
-                x = self.item_x + CARD_SIZE[0] / 2 + 35 + step * SPREAD_SPACING
-                y = self.item_y + CARD_SIZE[1] / 2
+                existing = self.box.card_named(card_name)
+                if existing:
+                    self.box.delete_card([existing])
+                    log.debug("🟩 Card deleted: %s", card_name)
 
+                x, y, angle = targets[step]
                 if self.face_up != None:
                     face = self.face_up
                 elif not self.available:
@@ -553,41 +580,101 @@ class Group(Drag):
                 else:
                     face = random.choice([True, False])
 
-                self.spawn_card(front_img, card_name, x, y, face_up=face)
+                self.spawn_card(card_name, x, y, face_up=face, angle=angle)
                 self.canva.after(50, lambda s=step + 1: generate_next(s))
             else:
                 self.box.spreading = False
                 self.canva.itemconfig(self.this_group, fill="#222222")
                 self.spawning = False
+                self.settle()
 
         generate_next(0)
 
-    def spawn_card(self, front_img, card_name, x, y, face_up):
-        card = Card(
+    def spawn_card(self, card_name, x, y, face_up, angle=0):
+        self.include(x, y, angle)
+        Card(
             self.canva,
             self.box,
             x,
             y,
             self.back_img,
-            front_img,
             card_name,
             group=self,
-            in_spread=True,
             face_up=face_up,
+            angle=angle,
+        )
+
+    def arrange(self, layout=None):
+        if (
+            self.flipping
+            or self.stacking
+            or self.spawning
+            or self.arranging
+            or self.stacked
+            or not self.group_cards
+        ):
+            return
+
+        names = list(LAYOUTS)
+        self.state.layout = (
+            layout or names[(names.index(self.state.layout) + 1) % len(names)]
         )
-        self.box.take_card(card_name, card)
-        self.group_cards.append(card)
+        self.unflatten()
+        self.arranging = True
+        cards = self.group_cards.copy()
+        starts = [(c.item_x, c.item_y - c.current_offset) for c in cards]
+        targets = self.layout_targets()
+        for c in cards:
+            c.current_offset = 0
+        # The cards travel upright and tilt on arrival; the rotated images
+        # are made on the preload pool meanwhile.
+        self.prerotate(cards, targets)
+
+        frame = 0
+
+        # One task moves the whole group, so a frame costs one callback and
+        # a coords call per card no matter how many cards there are.
+        def move():
+            nonlocal frame
+            frame += 1
+            ease = 1 - (1 - frame / LAYOUT_FRAMES) ** 3
+            self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+            for c, (sx, sy), (tx, ty, angle) in zip(cards, starts, targets):
+                if c.group is not self:
+                    continue
+                c.item_x = sx + (tx - sx) * ease
+                c.item_y = sy + (ty - sy) * ease
+                c.canva.coords(c.this_card, c.item_x, c.item_y)
+                self.include(c.item_x, c.item_y, angle)
+            collect_rotations()
+
+            if frame < LAYOUT_FRAMES:
+                return True
+            self.arranging = False
+            self.apply_angles(cards, targets)
+            if self.bounds[0] == math.inf:
+                self.measure()
+            self.settle()
+            return False
+
+        def cancel():
+            self.arranging = False
+            self.measure()
+
+        scheduler.add(move, cancel=cancel)
 
     def flip_all(self, event=None):
         if self.stacked:
             self.stack()
             return
-        if self.flipping or self.stacking or self.spawning:
+        if self.flipping or self.stacking or self.spawning or self.arranging:
             return
 
+        self.unflatten()
         self.flipping = True
         self.canva.itemconfig(self.this_group, fill="#111111")
         cards = self.group_cards.copy()
+        self.prerotate(cards, [(0, 0, c.state.angle) for c in cards], flip=True)
 
         def flip_next(step):
             if step < len(cards):
@@ -606,11 +693,20 @@ class Group(Drag):
         if self.spawning:
             return
 
+        history.record()
         self.canva.delete(self.drag_box)
         self.drag_box = None
-        self.box.delete_card(self.group_cards.copy())
+        self.unflatten()
+        # The cards go one by one after the view is gone; take them out of
+        # the group now so a flip or drag meanwhile treats them as loose.
+        cards = self.group_cards.copy()
+        for card in cards:
+            self.box.board.leave_group(card.state)
+        self.box.delete_card(cards)
         self.canva.delete(self.this_group)
+        self.unregister()
         Group.instances.remove(self)
+        Group.views.pop(self.state.id, None)
         del self
 
         global focus_group, focus_card
@@ -618,12 +714,20 @@ class Group(Drag):
         focus_card = None
 
     def remove_card(self, card):
-        self.group_cards.remove(card)
+        self.unflatten()
+        self.box.board.leave_group(card.state)
         if self.group_cards == []:
             self.canva.delete(self.this_group)
+            self.unregister()
+            Group.views.pop(self.state.id, None)
+            if self in Group.instances:
+                Group.instances.remove(self)
         elif self.this_group:
-            x, y = self.canva.coords(self.group_cards[0].this_card)
-            self.item_x = x - CARD_SIZE[0] / 2 - 35
+            if self.collapsed:
+                self.canva.itemconfig(self.top_card().this_card, state="normal")
+            if self.state.layout == "ribbon":
+                self.item_x = self.group_cards[0].item_x - CARD_SIZE[0] / 2 - 35
+            self.exclude(card.item_x, card.item_y, card.state.angle)
             self.canva.coords(
                 self.this_group,
                 self.item_x,
@@ -631,79 +735,181 @@ class Group(Drag):
                 self.item_x + self.w,
                 self.item_y + self.h,
             )
+            self.settle()
 
     def stack(self, event=None):
-        if self.flipping or self.stacking or self.spawning:
+        if self.flipping or self.stacking or self.spawning or self.arranging:
             return
 
+        self.unflatten()
         self.stacking = True
         self.canva.itemconfig(self.this_group, fill="#111111")
-        if self.stacked:
-            for i, card in enumerate(self.group_cards):
-
-                def move_to_spread(step, c, i, target_step=50):
-                    if self.drag_box:
-                        x1, y1 = self.canva.coords(self.group_cards[0].this_card)
-                        x2, y2 = self.canva.coords(self.group_cards[-1].this_card)
-                        x1 -= CARD_SIZE[0] / 2
-                        x2 += CARD_SIZE[0] / 2
-                        y1 -= CARD_SIZE[1] / 2
-                        y2 += CARD_SIZE[1] / 2
-                        self.canva.coords(self.drag_box, x1, y1, x2, y2)
-
-                    tx = self.item_x + CARD_SIZE[0] / 2 + 35 + i * SPREAD_SPACING
-                    ty = self.item_y + CARD_SIZE[1] / 2
-                    if step < target_step:
-                        c.item_x += (tx - c.item_x) / 8
-                        c.item_y += (ty - c.item_y) / 8
-                        c.canva.coords(c.this_card, c.item_x, c.item_y)
-                        c.canva.after(10, lambda s=step + 1: move_to_spread(s, c, i))
-                    else:
-                        c.item_x = tx
-                        c.item_y = ty
-                        c.canva.coords(c.this_card, c.item_x, c.item_y)
-                        if card == self.group_cards[-1]:
-                            self.stacking = False
-                            self.canva.itemconfig(self.this_group, fill="#333333")
-
-                move_to_spread(0, card, i)
+        cards = self.group_cards
+        pile = not self.stacked
+        if pile:
+            targets = None
+            for card in cards:
+                self.box.board.set_angle(card.state, 0)
         else:
-            for card in self.group_cards:
-
-                def move_to_stack(step, c, target_step=50):
-                    if self.drag_box:
-                        x1, y1 = self.canva.coords(self.group_cards[0].this_card)
-                        x2, y2 = self.canva.coords(self.group_cards[-1].this_card)
-                        x1 -= CARD_SIZE[0] / 2
-                        x2 += CARD_SIZE[0] / 2
-                        y1 -= CARD_SIZE[1] / 2
-                        y2 += CARD_SIZE[1] / 2
-                        self.canva.coords(self.drag_box, x1, y1, x2, y2)
-
-                    tx = self.item_x + CARD_SIZE[0] / 2 + 35
-                    ty = self.item_y + CARD_SIZE[1] / 2
-                    if step < target_step:
-                        c.item_x -= (c.item_x - tx) / 8
-                        c.item_y -= (c.item_y - ty) / 8
-                        c.canva.coords(c.this_card, c.item_x, c.item_y)
-                        c.canva.after(10, lambda s=step + 1: move_to_stack(s, c))
-                    else:
-                        c.item_x = tx
-                        c.item_y = ty
-                        c.canva.coords(c.this_card, c.item_x, c.item_y)
-                        if card == self.group_cards[-1]:
-                            self.stacking = False
-                            self.draggable = True
-                            self.canva.itemconfig(self.this_group, fill="#333333")
+            self.expand()
+            targets = self.layout_targets()
+            self.prerotate(cards, targets)
+        step = 0
+
+        def move():
+            nonlocal step
+            if pile:
+                tx = self.item_x + CARD_SIZE[0] / 2 + 35
+                ty = self.item_y + CARD_SIZE[1] / 2
+                angle = 0
+            self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+            for i, c in enumerate(cards):
+                if c.group is not self:
+                    continue
+                if not pile:
+                    tx, ty, angle = targets[i]  # type: ignore
+                if step < 50:
+                    c.item_x += (tx - c.item_x) / 8
+                    c.item_y += (ty - c.item_y) / 8
+                else:
+                    c.item_x, c.item_y = tx, ty
+                c.canva.coords(c.this_card, c.item_x, c.item_y)
+                self.include(c.item_x, c.item_y, angle)
+            if self.bounds[0] == math.inf:
+                self.measure()
+            if self.drag_box:
+                self.canva.coords(self.drag_box, *self.bounds)
+            collect_rotations()
+
+            step += 1
+            if step <= 50:
+                return True
+            self.stacking = False
+            self.draggable = True
+            self.canva.itemconfig(self.this_group, fill="#333333")
+            if not pile:
+                self.apply_angles(cards, targets)
+            if pile:
+                self.collapse()
+            else:
+                self.settle()
+            return False
+
+        def cancel():
+            self.stacking = False
+            self.draggable = True
+            self.canva.itemconfig(self.this_group, fill="#333333")
+            # The model already has the new state, so end up in it.
+            if pile:
+                self.collapse()
+            else:
+                self.settle()
+            self.measure()
+
+        scheduler.add(move, cancel=cancel)
+        self.box.board.stack(self.state)
+
+    def top_card(self):
+        ids = {c.this_card for c in self.group_cards}
+        for item_id in reversed(self.canva.find_withtag("card")):
+            if item_id in ids:
+                return Drag.items[item_id]
+
+    def collapse(self):
+        if self.collapsed or not self.stacked or not self.group_cards:
+            return
+
+        top = self.top_card()
+        for c in self.group_cards:
+            if c is not top:
+                self.canva.itemconfig(c.this_card, state="hidden")
+        self.collapsed = True
+
+    def expand(self):
+        if not self.collapsed:
+            return
+
+        for c in self.group_cards:
+            self.canva.itemconfig(c.this_card, state="normal")
+        self.collapsed = False
+
+    def settle(self):
+        if self.settle_job:
+            self.canva.after_cancel(self.settle_job)
+        self.settle_job = self.canva.after(FLATTEN_DELAY, self.flatten)
+
+    def flatten(self):
+        self.settle_job = None
+        if (
+            self.flat_item
+            or not self.group_cards
+            or self.spawning
+            or self.moving
+            or self.flipping
+            or self.stacking
+            or self.arranging
+            or self.stacked
+            or any(c.flipping for c in self.group_cards)
+        ):
+            return
 
-                move_to_stack(0, card)
+        ids = {c.this_card: c for c in self.group_cards}
+        cards = [ids[i] for i in self.canva.find_withtag("card") if i in ids]
+        places = []
+        for c in cards:
+            img = source_image(c.shown_img())
+            x = round(c.item_x) - img.width // 2
+            y = round(c.item_y - c.current_offset) - img.height // 2
+            places.append((img, x, y))
+        left = min(x for _, x, _ in places)
+        top = min(y for _, _, y in places)
+        right = max(x + img.width for img, x, _ in places)
+        bottom = max(y + img.height for img, _, y in places)
+
+        frame = Image.new("RGBA", (right - left, bottom - top))
+        for img, x, y in places:
+            frame.alpha_composite(img, (x - left, y - top))
+
+        self.flat_img = ImageTk.PhotoImage(frame)
+        pil_images[str(self.flat_img)] = frame
+        self.flat_item = self.canva.create_image(
+            left, top, image=self.flat_img, anchor="nw", tags="flat"
+        )
+        self.canva.tag_lower(self.flat_item, cards[0].this_card)
+        for c in cards:
+            self.canva.itemconfig(c.this_card, state="hidden")
+        Group.flat_items[self.flat_item] = self
+
+    def unflatten(self):
+        if self.settle_job:
+            self.canva.after_cancel(self.settle_job)
+            self.settle_job = None
+        if not self.flat_item:
+            return
 
-        self.stacked = not self.stacked
+        for c in self.group_cards:
+            self.canva.itemconfig(c.this_card, state="normal")
+        self.canva.delete(self.flat_item)
+        Group.flat_items.pop(self.flat_item, None)
+        self.flat_item = None
+        pil_images.pop(str(self.flat_img), None)
+        self.flat_img = None
 
     def update_wave(self, mouse_x, mouse_y):
-        if self.moving or self.stacked or abs(mouse_y - self.item_y) > NO_WAVE_RANGE:
+        if (
+            self.moving
+            or self.stacked
+            or self.arranging
+            or self.state.layout != "ribbon"
+            or abs(mouse_y - self.item_y) > NO_WAVE_RANGE
+        ):
+            if self.waving:
+                self.waving = False
+                self.settle()
             return
 
+        self.waving = True
+        self.unflatten()
         for card in self.group_cards:
             distance = abs(mouse_x - card.item_x + 26)
             if distance < WAVE_WIDTH:
@@ -719,26 +925,46 @@ class Group(Drag):
             )
 
     def reset_wave(self):
-        if self.moving or self.stacked:
+        # Only one easing loop per group, and none at all when the cards are
+        # already flat, so leaving the window does not wake an idle board.
+        if self.resetting or not any(c.current_offset for c in self.group_cards):
             return
+        self.resetting = True
+        scheduler.add(self.ease_wave, EFFECT, cancel=self.end_wave)
+
+    def end_wave(self):
+        self.resetting = False
 
+    def ease_wave(self):
+        if self.moving or self.stacked or self.arranging:
+            self.resetting = False
+            return False
+
+        # Under load the cards drop straight back instead of easing.
+        ease = 0.2 if scheduler.quality >= 0.5 else 1
         is_done = True
         for card in self.group_cards:
             target_offset = 0
-            card.current_offset += (target_offset - card.current_offset) * 0.2
+            card.current_offset += (target_offset - card.current_offset) * ease
             card.canva.coords(
                 card.this_card, card.item_x, card.item_y - card.current_offset
             )
             if abs(card.current_offset) > 0.1:
                 is_done = False
             else:
+                card.current_offset = 0
                 card.canva.coords(card.this_card, card.item_x, card.item_y)
 
         if not is_done:
-            self.group_cards[0].canva.after(10, self.reset_wave)
+            return True
+        self.resetting = False
+        self.settle()
+        return False
 
 
 class Card(Drag):
+    views = {}
+
     def __init__(
         self,
         canva,
@@ -746,33 +972,76 @@ class Card(Drag):
         x,
         y,
         back_img,
-        front_img,
         card_name,
         group=None,
-        in_spread=False,
         face_up=False,
+        state=None,
+        angle=0,
     ):
         self.back_img = back_img
-        self.front_img = front_img
-        self.face_up = face_up
-        self.this_card = canva.create_image(
-            x, y, image=self.front_img if self.face_up else self.back_img, tags="card"
-        )
         self.box = box
-        self.group = group
-        self.card_name = card_name
+        self.state = state or box.board.spawn(card_name, x, y, face_up, angle)
+        self.this_card = canva.create_image(x, y, image=self.shown_img(), tags="card")
         super().__init__(canva, x, y, self.this_card)
-        self.in_spread = in_spread
+        self.size = CARD_SIZE
+        Card.views[self.state.id] = self
+        if group:
+            box.board.join_group(self.state, group.state)
         self.flipping = False
         self.current_offset = 0
 
         self.left_click = self.flip
         self.middle_click = self.delete
-        self.right_click = lambda event: self.box.list_card_value(self.card_name)
+        self.right_click = lambda event: self.box.list_card_value(
+            deck.rank[self.card_name]
+        )
+
+    @property
+    def item_x(self):
+        return self.state.x
+
+    @item_x.setter
+    def item_x(self, value):
+        self.state.x = value
+
+    @property
+    def item_y(self):
+        return self.state.y
+
+    @item_y.setter
+    def item_y(self, value):
+        self.state.y = value
+
+    @property
+    def card_name(self):
+        return self.state.name
+
+    @property
+    def face_up(self):
+        return self.state.face_up
+
+    @face_up.setter
+    def face_up(self, value):
+        self.box.board.set_face(self.state, value)
+
+    @property
+    def in_spread(self):
+        return self.state.in_spread
+
+    @property
+    def group(self):
+        return Group.views.get(self.state.group)
+
+    @property
+    def front_img(self):
+        return load_image(deck.image[self.state.name], CARD_SIZE)
+
+    def shown_img(self):
+        img = self.front_img if self.face_up else self.back_img
+        return rotate_image(img, self.state.angle) if self.state.angle else img
 
     def dragging(self, state):
         if self.in_spread:
-            self.in_spread = False
             self.group.remove_card(self)  # type: ignore
 
     def up(self):
@@ -792,28 +1061,35 @@ class Card(Drag):
         animate_up(0)
 
     def flip(self, event=None):
-        global swap_target_name
         if self.flipping:
             return
 
-        if self.face_up == False and swap_target_name:
-            self.swap_with(swap_target_name)
-            swap_target_name = None
+        if self.group:
+            self.group.unflatten()
+        if self.face_up == False and self.box.board.target:
+            self.swap_with(self.box.board.target)
+            self.box.board.target = None
 
         if self.in_spread:
-            self.in_spread = False
             self.group.remove_card(self)  # type: ignore
             self.up()
             return
 
         self.flipping = True
-        self.animate_scale(0, 16)
+        self.animate_scale(0, flip_steps(16))
 
     def flip_all(self, steps=32):
+        if self.group:
+            self.group.unflatten()
         self.flipping = True
-        self.animate_scale(0, steps)
+        self.animate_scale(0, flip_steps(steps))
 
     def animate_scale(self, step, total_steps):
+        probe.changed()
+        if step == 0 and self.state.angle:
+            # Flip frames are upright, so a tilted card turns over in one go.
+            self.face_up = not self.face_up
+            step = total_steps + 1
         shrink_steps = total_steps / 2
         if step < shrink_steps:
             scale = (shrink_steps - step) / shrink_steps
@@ -829,59 +1105,57 @@ class Card(Drag):
             self.canva.itemconfig(self.this_card, image=img)
         else:
             self.flipping = False
+            self.canva.itemconfig(self.this_card, image=self.shown_img())
+            if self.in_spread:
+                self.group.settle()  # type: ignore
             return
         self.canva.after(10, lambda: self.animate_scale(step + 1, total_steps))
 
     def scale_image(self, scale):
         img = self.front_img if self.face_up else self.back_img
-        pil = ImageTk.getimage(img)
-        w, h = pil.size
-        new_w = max(1, int(w * scale))
-        resized = pil.resize((new_w, h))
-        return ImageTk.PhotoImage(resized)
+        return flip_frame(img, scale)
 
-    def delete(self, event=None, count=10):
+    def delete(self, event=None, count=10, record=True):
         global focus_card
         focus_card = None
 
+        if record:
+            history.record()
+        # A deleted group drops its view at once while its cards go one by
+        # one, so the rest of them have no group view left to leave.
+        group = self.group
+        if group:
+            group.unflatten()
         star_effect(self.canva, self.item_x, self.item_y, count)
-        self.box.return_card(self.card_name, self)
-        if self.in_spread:
-            self.group.remove_card(self)  # type: ignore
+        if self.in_spread and group:
+            group.remove_card(self)
 
-        self.canva.delete(self.this_card)
+        self.box.board.remove(self.state)
+        self.unregister()
         del self
 
     def swap_with(self, target_name):
-        for card in self.box.used_card:
-            if card.card_name == target_name:
-                self.front_img, card.front_img = card.front_img, self.front_img
-                self.card_name, card.card_name = card.card_name, self.card_name
-
-                self.canva.itemconfig(
-                    self.this_card,
-                    image=self.front_img if self.face_up else self.back_img,
-                )
-                self.canva.itemconfig(
-                    card.this_card,
-                    image=card.front_img if card.face_up else card.back_img,
-                )
-                print(f"🃏 Swapped {self.card_name} ↔ {card.card_name}")
-                return
+        card = self.box.card_named(target_name)
+        if card and card.group:
+            card.group.unflatten()
+        history.record()
+        self.box.board.swap(self.state, target_name)
+        if card:
+            log.debug("🃏 Swapped %s ↔ %s", self.card_name, card.card_name)
 
-        self.front_img = load_image(target_name, CARD_SIZE)
-        self.box.return_card(self.card_name, self)
-        self.card_name = target_name
-        self.canva.itemconfig(
-            self.this_card,
-            image=self.front_img,
-        )
-        self.box.take_card(self.card_name, self)
+
+def card_box(x, y, angle=0):
+    # A tilted card fits in a square as wide as its diagonal.
+    w, h = CARD_SIZE
+    if angle:
+        w = h = math.hypot(w, h)
+    return x - w / 2, y - h / 2, x + w / 2, y + h / 2
 
 
 def no_card(canva, x, y):
     text = canva.create_text(x, y, text="❌", fill="#FF7777", font=("Arial", 15))
     canva.tag_raise(text)
+    probe.changed()
 
     def animate(step):
         if step < 20:
@@ -895,8 +1169,9 @@ def no_card(canva, x, y):
 
 
 def star_effect(canva, x, y, count):
-    stars_group = []
-    for _ in range(count):
+    stars = []
+    now = time.perf_counter()
+    for _ in range(max(1, round(count * scheduler.quality))):
         angle = random.uniform(0, 2 * math.pi)
         speed = random.uniform(10, 70)
         dx = math.cos(angle) * speed
@@ -908,17 +1183,90 @@ def star_effect(canva, x, y, count):
             fill=random.choice(["#FFFB00", "#FFDD33", "#FFFF99"]),
             font=("Arial", random.randint(9, 11)),
         )
-        stars_group.append(star)
-        move_star(canva, star, dx, dy, 0)
-        delay = random.randint(500, 1000)
-        canva.after(delay, lambda s=star: canva.delete(s))
+        stars.append((star, dx, dy, now + random.uniform(0.5, 1)))
+    step = 0
 
+    # The whole burst is one low-priority task: it can skip frames when
+    # card motion needs the time, and it ends when the last star is gone.
+    def move():
+        nonlocal stars, step
+        now = time.perf_counter()
+        for star, dx, dy, end in stars:
+            if now >= end:
+                canva.delete(star)
+            elif step <= 60:
+                canva.move(star, dx / (10 + step * 2), dy / (10 + step * 2))
+        stars = [s for s in stars if now < s[3]]
+        step += 1
+        return bool(stars)
 
-def move_star(canva, star, dx, dy, step):
-    if step > 60:
-        return
-    canva.move(star, dx / (10 + step * 2), dy / (10 + step * 2))
-    canva.after(10, lambda: move_star(canva, star, dx, dy, step + 1))
+    scheduler.add(move, EFFECT)
+
+
+def flip_steps(steps):
+    # Half the frames when the scheduler is short on time. The widths are
+    # still in the pre-rendered flip sheets.
+    return steps if scheduler.quality >= 0.75 else steps // 2
+
+
+def find_item(event):
+    current = canva.find_withtag("current")
+    if current and current[0] not in Group.flat_items:
+        return Drag.items.get(current[0])
+
+    for item_id in reversed(canva.find_overlapping(event.x, event.y, event.x, event.y)):
+        if item_id in Group.flat_items:
+            Group.flat_items[item_id].unflatten()
+            return find_item(event)
+        if item_id in Drag.items:
+            return Drag.items[item_id]
+    return None
+
+
+def stamp_input(kind, item, start):
+    if item:
+        probe.stamp(f"{kind} {type(item).__name__.lower()}", start)
+
+
+def on_press(event):
+    global pressed_item
+    start = time.perf_counter()
+    pressed_item = find_item(event)
+    stamp_input("press", pressed_item, start)
+    if pressed_item:
+        pressed_item._set_focus(event)
+        pressed_item._start_drag(event)
+
+
+def on_press_motion(event):
+    if pressed_item:
+        pressed_item._on_drag(event)
+
+
+def on_release(event):
+    global pressed_item
+    item, pressed_item = pressed_item, None
+    stamp_input("release", item, None)
+    if item:
+        item._stop_drag(event)
+
+
+def on_middle_click(event):
+    start = time.perf_counter()
+    item = find_item(event)
+    stamp_input("middle", item, start)
+    if item:
+        item._set_focus(event)
+        item.middle_click(event)
+
+
+def on_right_click(event):
+    start = time.perf_counter()
+    item = find_item(event)
+    stamp_input("right", item, start)
+    if item:
+        item._set_focus(event)
+        item.right_click(event)
 
 
 def on_motion(event):
@@ -932,31 +1280,106 @@ def on_leave(event):
 
 
 def set_target(target_name):
-    global swap_target_name
-    swap_target_name = target_name
-    for card in focus_box.used_card:  # type: ignore
-        if card.card_name == target_name:
-            card.face_up = False
-            card.canva.itemconfig(
-                card.this_card,
-                image=card.front_img if card.face_up else card.back_img,
-            )
-            return
+    card = focus_box.card_named(target_name)  # type: ignore
+    if card and card.group:
+        card.group.unflatten()
+    focus_box.board.force(target_name)  # type: ignore
+
+
+def render():
+    changes = board.flush()
+    for kind, key in changes:
+        card = Card.views.get(key)
+        if card is None:
+            continue
+
+        if kind == "image" and not card.flipping:
+            canva.itemconfig(card.this_card, image=card.shown_img())
+        elif kind == "move":
+            canva.coords(card.this_card, card.item_x, card.item_y - card.current_offset)
+        elif kind == "delete":
+            card.unregister()
+            canva.delete(card.this_card)
+            del Card.views[key]
+            schedule_fit()
+    if changes:
+        probe.changed()
+
+
+def place_window(x1, y1, x2, y2):
+    x1, y1 = max(0, int(x1)), max(0, int(y1))
+    x2, y2 = min(screen_w, math.ceil(x2)), min(screen_h, math.ceil(y2))
+    if [x1, y1, x2, y2] == window_box or x2 <= x1 or y2 <= y1:
+        return
+    window_box[:] = [x1, y1, x2, y2]
+    # The canvas stays screen-sized and is shifted against the window, so
+    # canvas coordinates keep matching screen coordinates at any fit.
+    root.geometry(f"{x2 - x1}x{y2 - y1}+{x1}+{y1}")
+    canva.place(x=-x1, y=-y1, width=screen_w, height=screen_h)
+
+
+def reserve_window(x1, y1, x2, y2):
+    if not FIT_WINDOW:
+        return
+    left, top, right, bottom = window_box
+    if (
+        x1 - FIT_MARGIN < left
+        or y1 - FIT_MARGIN < top
+        or x2 + FIT_MARGIN > right
+        or y2 + FIT_MARGIN > bottom
+    ):
+        place_window(
+            min(left, x1 - FIT_MARGIN),
+            min(top, y1 - FIT_MARGIN),
+            max(right, x2 + FIT_MARGIN),
+            max(bottom, y2 + FIT_MARGIN),
+        )
+
+
+def fit_window():
+    global fit_job
+    fit_job = None
+    bbox = canva.bbox("all")
+    if bbox:
+        x1, y1, x2, y2 = bbox
+        place_window(x1 - FIT_MARGIN, y1 - FIT_MARGIN, x2 + FIT_MARGIN, y2 + FIT_MARGIN)
+
+
+def schedule_fit():
+    # Growing happens at once; shrinking waits until things have settled so a
+    # burst of deletes or a drag ends in a single resize.
+    global fit_job
+    if not FIT_WINDOW:
+        return
+    if fit_job:
+        canva.after_cancel(fit_job)
+    fit_job = canva.after(FIT_DELAY, fit_window)
 
 
 def key_pressed(event):
-    global focus_box, focus_group, focus_card, swap_target_name
+    global focus_box, focus_group, focus_card, query_digits
+    probe.stamp(key_name(event.keysym, event.state))
     key = event.keysym.lower()
     ctrl = (event.state & 0x4) != 0
     shift = (event.state & 0x1) != 0
     actions = {}
 
+    if query_digits is not None:
+        secret_query(key)
+        return
+    if key == "n" and not ctrl:
+        query_digits = ""
+        return
+
     if focus_box:
         actions |= {"e": focus_box.spawn_card, "r": focus_box.reset_position}
     if focus_card:
         actions |= {"d": focus_card.delete, "f": focus_card.flip}
+    if focus_group:
+        actions |= {"t": focus_group.arrange}
+    actions |= {"u": lambda: restore_history(history.redo if shift else history.undo)}
     if ctrl:
-        actions |= {"r": root.destroy}
+        actions |= {"r": root.destroy, "p": play_routine}
         if focus_group:
             actions |= {
                 "e": focus_group.stack,
@@ -1017,7 +1440,7 @@ def key_pressed(event):
 
     if key == "a":
         if ctrl and shift:
-            set_target("spade-(1).png")
+            set_target(deck.card("spade", 1))
             return
         elif ctrl:
             set_target(focus_card.card_name)  # type: ignore
@@ -1041,6 +1464,71 @@ def key_pressed(event):
     focus_box.list_card_value(key)  # type: ignore
 
 
+def secret_query(key):
+    global query_digits
+    if key.isdigit():
+        query_digits += key
+        return
+
+    digits, query_digits = query_digits, None
+    if focus_group:
+        index = focus_group.index
+    else:
+        index = stack_indexes[MEMORIZED_STACK]
+
+    if not digits:
+        if key == "return" and focus_card:
+            position = index.position_of(focus_card.card_name)
+            secret_hint(
+                canva,
+                focus_card.item_x,
+                focus_card.item_y - CARD_SIZE[1] / 2 - 10,
+                position or "?",
+            )
+        return
+
+    name = index.card_at(int(digits))
+    if name is None:
+        no_card(canva, box.item_x, box.item_y - 25)
+    elif key == "return":
+        set_target(name)
+    elif key == "space":
+        highlight_card(name)
+
+
+def secret_hint(canva, x, y, text):
+    hint = canva.create_text(x, y, text=text, fill="#555555", font=("Arial", 9))
+    canva.after(1000, lambda: canva.delete(hint))
+
+
+def highlight_card(name):
+    card = box.card_named(name)
+    if not card:
+        no_card(canva, box.item_x, box.item_y - 25)
+        return
+
+    x, y = card.item_x, card.item_y
+    w, h = CARD_SIZE[0] / 2, CARD_SIZE[1] / 2
+    outline = canva.create_rectangle(
+        x - w,
+        y - h,
+        x + w,
+        y + h,
+        outline="#FFA500",
+        width=3,
+        dash=(3, 3),
+        tags="drag_outline",
+    )
+    canva.after(800, lambda: canva.delete(outline))
+
+
+def play_routine():
+    if not routine_player:
+        no_card(canva, box.item_x, box.item_y - 25)
+        return
+    routine_player.start()
+
+
 def flip_all_cards():
     if not focus_box or not focus_box.used_card:  # type: ignore
         return
@@ -1062,45 +1550,424 @@ def delete_all_cards():
         return
 
     cards = focus_box.used_card.copy()  # type: ignore
+    history.record()
 
     def delete_next(i, cards):
         if i < len(cards):
-            cards[i].delete(count=5)
+            if cards[i].state.id in board.cards:
+                cards[i].delete(count=5, record=False)
             focus_box.canva.after(50, lambda: delete_next(i + 1, cards))  # type: ignore
+        else:
+            focus_box.pending -= 1  # type: ignore
 
+    focus_box.pending += 1  # type: ignore
     delete_next(0, cards)
 
 
+def animating():
+    return (
+        box.spreading
+        or box.pending
+        or pressed_item is not None
+        or any(
+            g.spawning or g.moving or g.flipping or g.stacking or g.arranging
+            for g in Group.instances
+        )
+        or any(c.flipping for c in Card.views.values())
+    )
+
+
+def restore_history(step):
+    # Swap the whole board for a snapshot and redraw it in place: the views
+    # are rebuilt straight from the restored state, with no animation.
+    global focus_group, focus_card, list_card
+    if animating():
+        no_card(canva, box.item_x, box.item_y - 25)
+        return
+    if not step():
+        return
+
+    for g in list(Group.instances):
+        g.unflatten()
+        canva.delete(g.drag_box)
+        canva.delete(g.this_group)
+        g.unregister()
+    for c in Card.views.values():
+        canva.delete(c.this_card)
+        c.unregister()
+    Group.instances.clear()
+    Group.views.clear()
+    Card.views.clear()
+
+    for state in board.cards.values():
+        front = load_image(deck.image[state.name], CARD_SIZE)
+        rotate_async(front if state.face_up else back_img, state.angle)
+    for state in board.groups.values():
+        Group(canva, box, back_img, state.order, state.sort, None, state=state)
+    for state in board.cards.values():
+        Card(canva, box, state.x, state.y, back_img, state.name, state=state)
+    for g in Group.instances:
+        g.measure()
+        if g.stacked:
+            g.collapse()
+        else:
+            g.settle()
+
+    focus_group = None
+    focus_card = None
+    list_card = None
+    if FIT_WINDOW:
+        fit_window()
+
+
+def run_command(request):
+    cmd = request.get("cmd")
+    if cmd == "ping":
+        return None
+    if cmd == "log":
+        count = request.get("count", 50)
+        if type(count) is not int or count < 0:
+            raise ValueError(f"count must be a non-negative int: {count!r}")
+        return log.dump()[-count:] if count else []
+    if cmd == "stats":
+        return overlay_stats()
+    if cmd == "latency":
+        return probe.dump(request.get("clear", False))
+    if cmd == "key":
+        keysym, state = request.get("keysym"), request.get("state", 0)
+        if not isinstance(keysym, str) or not keysym:
+            raise ValueError(f"keysym must be a key name: {keysym!r}")
+        if type(state) is not int or state < 0:
+            raise ValueError(f"state must be a non-negative int: {state!r}")
+        # Queued like a real key event, so it goes through key_pressed.
+        try:
+            root.event_generate("<KeyPress>", keysym=keysym, state=state, when="tail")
+        except tk.TclError:
+            raise ValueError(f"unknown keysym: {keysym}") from None
+        return cmd
+    if not focus_box:
+        raise ValueError("no box in focus")
+
+    if cmd == "spawn":
+        focus_box.spawn_card()
+    elif cmd == "spread":
+        if request.get("group", "all") not in deck.masks:
+            raise ValueError(f"unknown group: {request['group']}")
+        if request.get("sort", "random") not in SORTS:
+            raise ValueError(f"unknown sort: {request['sort']}")
+        focus_box.spawn_spread(
+            group=request.get("group", "all"),
+            sort=request.get("sort", "random"),
+            delete_used=request.get("delete_used", True),
+            face_up=request.get("face_up", False),
+        )
+    elif cmd == "target":
+        name = request.get("name")
+        if name is not None and name not in deck.image:
+            raise ValueError(f"unknown card: {name}")
+        set_target(name)
+    elif cmd in ("flip", "delete"):
+        target = request.get("target", "card")
+        if "name" in request:
+            card = focus_box.card_named(request["name"])
+        else:
+            card = focus_card
+        actions = {
+            "flip": {
+                "all": flip_all_cards,
+                "group": focus_group and focus_group.flip_all,
+                "card": card and card.flip,
+            },
+            "delete": {
+                "all": delete_all_cards,
+                "group": focus_group and focus_group.delete_group,
+                "card": card and card.delete,
+            },
+        }
+        func = actions[cmd].get(target)
+        if not func:
+            raise ValueError(f"nothing to {cmd}: {target}")
+        func()
+    elif cmd == "reset":
+        delete_all_cards()
+        focus_box.reset_position()
+    elif cmd == "routine":
+        play_routine()
+    elif cmd == "layout":
+        style = request.get("style")
+        if style is not None and style not in LAYOUTS:
+            raise ValueError(f"unknown layout: {style}")
+        if not focus_group:
+            raise ValueError("no group in focus")
+        focus_group.arrange(style)
+    elif cmd in ("undo", "redo"):
+        restore_history(getattr(history, cmd))
+    else:
+        raise ValueError(f"unknown command: {cmd}")
+    return cmd
+
+
+def overlay_stats():
+    # An invisible full-screen item forces the next flush to redraw everything.
+    canva.delete(canva.create_rectangle(0, 0, screen_w, screen_h, outline=""))
+    start = time.perf_counter()
+    canva.update_idletasks()
+    return {
+        "items": len(canva.find_all()),
+        "images": len(root.tk.splitlist(root.tk.call("image", "names"))),
+        "timers": len(root.tk.splitlist(root.tk.call("after", "info"))),
+        "blocks": sys.getallocatedblocks(),
+        "frame_ms": (time.perf_counter() - start) * 1000,
+        "window": list(window_box),
+        "quality": scheduler.quality,
+        "cards": len(board.cards),
+        "pending": box.pending,
+        "orphans": orphans(),
+        "errors": callback_errors,
+        "renderer": RENDERER,
+    }
+
+
+def report_error(kind, value, trace):
+    # Tk hands every exception raised in a callback here instead of stopping;
+    # stats reports the count so the soak can fail on it.
+    global callback_errors
+    callback_errors += 1
+    text = "".join(traceback.format_exception(kind, value, trace))
+    log.error("🟥 Callback failed: %s", text.rstrip())
+
+
+def orphans():
+    # Views and model out of step: drawn cards Board no longer has, Board
+    # cards with nothing drawn, and spread cards whose group view is gone.
+    return (
+        sum(1 for key in Card.views if key not in board.cards)
+        + sum(1 for key in board.cards if key not in Card.views)
+        + sum(
+            1
+            for c in board.cards.values()
+            if c.in_spread and c.group not in Group.views
+        )
+    )
+
+
+def decode_image(name, size):
+    return card_cache.load_scaled(os.path.join(CARD_FOLDER, name), size)
+
+
+def preload_image(name, size):
+    key = (name, size)
+    if key not in image_jobs:
+        job = preload_pool.submit(decode_image, name, size)
+        job.add_done_callback(lambda j, key=key: ready_images.put(key))
+        image_jobs[key] = job
+    return image_jobs[key]
+
+
+def cache_image(key):
+    if key not in image_cache:
+        pil = image_jobs[key].result()
+        photo = ImageTk.PhotoImage(pil)
+        pil_images[str(photo)] = pil
+        image_names[str(photo)] = key[0]
+        image_cache[key] = photo
+    return image_cache[key]
+
+
+def drain_preload(batch=8):
+    for _ in range(batch):
+        try:
+            key = ready_images.get_nowait()
+        except queue.Empty:
+            break
+        # One broken image must not stop the rest from loading. Its job is
+        # dropped, so the next load of it tries again and reports there.
+        try:
+            cache_image(key)
+        except Exception as e:
+            log.error("🟥 Image %s at %dx%d not loaded: %s", key[0], *key[1], e)
+            image_jobs.pop(key, None)
+
+    if len(image_cache) < len(image_jobs):
+        canva.after(10, drain_preload)
+    else:
+        preload_pool.submit(card_cache.save_digests)
+
+
 def load_image(name, size):
-    place = os.path.join(CARD_FOLDER, name)
-    return ImageTk.PhotoImage(Image.open(place).resize(size))
+    preload_image(name, size)
+    return cache_image((name, size))
+
+
+def preload_flip_frames():
+    if card_cache.missing_flip_sheets(deck, CARD_SIZE, CARD_FOLDER):
+        # First run at this size: build the cache in another process and
+        # resample flips on the fly until it is done, then load the sheets.
+        build = subprocess.Popen(
+            [
+                sys.executable,
+                "card_cache.py",
+                *map(str, base_card_size),
+                str(display_scale),
+                *map(str, base_box_size),
+            ]
+        )
+        threading.Thread(target=wait_for_cache, args=(build,), daemon=True).start()
+        return
+    load_flip_sheets()
 
 
+def wait_for_cache(build):
+    if build.wait() == 0:
+        preload_pool.submit(load_flip_sheets)
+    else:
+        log.warning("⚠️ card_cache.py failed, flips stay resampled")
+
+
+def load_flip_sheets():
+    for name, place in card_cache.flip_assets(deck, CARD_FOLDER).items():
+        flip_jobs[name] = preload_pool.submit(
+            card_cache.load_flip_sheet, place, CARD_SIZE
+        )
+
+
+def flip_frame(photo, scale):
+    pil = source_image(photo)
+    w, h = pil.size
+    new_w = max(1, int(w * scale))
+    key = (str(photo), new_w)
+    if key not in flip_cache:
+        job = flip_jobs.get(image_names.get(str(photo)))
+        frames = job.result() if job and job.done() else None
+        if frames and new_w in frames:
+            frame = frames[new_w]
+        else:
+            frame = pil.resize((new_w, h), card_cache.RESAMPLE)
+        flip_cache[key] = ImageTk.PhotoImage(frame)
+        pil_images[str(flip_cache[key])] = frame
+    return flip_cache[key]
+
+
+def rotate_image(photo, angle):
+    key = (str(photo), angle)
+    if key not in rotated_cache:
+        job = rotate_jobs.pop(key, None)
+        cache_rotation(key, job.result() if job else rotate(source_image(photo), angle))
+    return rotated_cache[key]
+
+
+def rotate(pil, angle):
+    return pil.rotate(-angle, Image.BICUBIC, expand=True)
+
+
+def rotate_async(photo, angle):
+    # PIL releases the GIL while it rotates, so the pool turns a whole fan
+    # of cards while they are still moving.
+    key = (str(photo), angle)
+    if angle and key not in rotated_cache and key not in rotate_jobs:
+        rotate_jobs[key] = preload_pool.submit(rotate, source_image(photo), angle)
+
+
+def collect_rotations():
+    # Wraps finished rotations in Tk images between motion frames, so the
+    # frame that applies the angles only looks them up.
+    for key, job in list(rotate_jobs.items()):
+        if job.done():
+            del rotate_jobs[key]
+            cache_rotation(key, job.result())
+
+
+def cache_rotation(key, pil):
+    rotated = ImageTk.PhotoImage(pil)
+    pil_images[str(rotated)] = pil
+    rotated_cache[key] = rotated
+
+
+def source_image(photo):
+    pil = pil_images.get(str(photo))
+    if pil is None:
+        pil = ImageTk.getimage(photo).convert("RGBA")
+    return pil
+
+
+try:
+    deck = load_deck(CARD_FOLDER, DECK_MANIFEST)
+except DeckError as e:
+    log.warning("⚠️ Deck manifest not loaded: %s", e)
+    deck = scan_deck(CARD_FOLDER)
+card_imgs_names = deck.names
+
 root = tk.Tk()
+root.report_callback_exception = report_error
 root.overrideredirect(True)
-root.wm_attributes("-transparentcolor", BG_COLOR)
+try:
+    root.wm_attributes("-transparentcolor", BG_COLOR)
+except tk.TclError:
+    log.warning("⚠️ No -transparentcolor on this platform")
+
+display_scale = DISPLAY_SCALE or card_cache.display_scale(root)
+base_card_size, base_box_size = CARD_SIZE, BOX_SIZE
+if display_scale != 1:
+    CARD_SIZE = card_cache.scale_size(CARD_SIZE, display_scale)
+    BOX_SIZE = card_cache.scale_size(BOX_SIZE, display_scale)
+    SPREAD_SPACING = round(SPREAD_SPACING * display_scale)
+    LIST_SPACING = round(LIST_SPACING * display_scale)
+    WAVE_WIDTH = round(WAVE_WIDTH * display_scale)
+    WAVE_HEIGHT = round(WAVE_HEIGHT * display_scale)
+    NO_WAVE_RANGE = round(NO_WAVE_RANGE * display_scale)
+    log.info("🟩 Display scale %.2f, cards %dx%d", display_scale, *CARD_SIZE)
+
+preload_image(deck.box, BOX_SIZE)
+preload_image(deck.back, CARD_SIZE)
+for name in deck.images:
+    preload_image(name, CARD_SIZE)
+preload_pool.submit(preload_flip_frames)
 
 screen_w = root.winfo_screenwidth()
 screen_h = root.winfo_screenheight()
-root.geometry(f"{screen_w}x{screen_h}+0+0")
-canva = tk.Canvas(
-    root, width=screen_w, height=screen_h, bg=BG_COLOR, highlightthickness=0
+canva = make_canvas(
+    RENDERER,
+    root,
+    source_image,
+    width=screen_w,
+    height=screen_h,
+    bg=BG_COLOR,
+    highlightthickness=0,
 )
-canva.pack(fill="both", expand=True)
+place_window(0, 0, screen_w, screen_h)
 
-box_img = load_image("box.png", BOX_SIZE)
-back_img = load_image("back.png", CARD_SIZE)
-card_imgs_names = [
-    f
-    for f in os.listdir(CARD_FOLDER)
-    if f.endswith(".png") and f not in ("box.png", "back.png")
-]
+box_img = load_image(deck.box, BOX_SIZE)
+back_img = load_image(deck.back, CARD_SIZE)
+canva.after(10, drain_preload)
 
-box = Box(canva, screen_w / 2, screen_h - 107, box_img, back_img, card_imgs_names)
+board = Board(deck, notify=lambda: canva.after_idle(render))
+history = History(board, HISTORY_SIZE)
+probe = LatencyProbe(root)
+scheduler = FrameScheduler(canva, on_error=report_error, on_frame=probe.changed)
+box = Box(canva, screen_w / 2, screen_h - 107, box_img, back_img, board)
 focus_box = box
-
+if FIT_WINDOW:
+    fit_window()
+stack_indexes = build_indexes(deck)
+
+if os.path.exists(ROUTINE_FILE):
+    try:
+        steps = load_routine(ROUTINE_FILE, deck)
+        routine_player = RoutinePlayer(root, run_command, steps)
+        log.info("🟩 Routine loaded: %d steps", len(steps))
+    except RoutineError as e:
+        log.warning("⚠️ Routine not loaded: %s", e)
+
+canva.bind("<Button-1>", on_press)
+canva.bind("<B1-Motion>", on_press_motion)
+canva.bind("<ButtonRelease-1>", on_release)
+canva.bind("<Button-2>", on_middle_click)
+canva.bind("<Button-3>", on_right_click)
 root.bind("<Motion>", on_motion)
 root.bind("<Leave>", on_leave)
 root.bind("<Key>", key_pressed)
 
+if REMOTE_CONTROL:
+    RemoteServer(root, run_command).start()
+
 root.mainloop()
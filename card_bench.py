@@ -0,0 +1,63 @@
+from card_deck import load_deck
+from card_latency import run
+from card_remote import launch_overlay, report, stop_overlay
+from card_render import RENDERERS
+import json, os, sys, tempfile, time
+
+DECKS = 4
+FRAMES = 50
+
+
+def shoe_manifest(path, decks=DECKS):
+    # The bundled deck repeated as a shoe, so one spread lays out a couple
+    # of hundred card items and per-item canvas cost dominates.
+    deck = load_deck()
+    cards = [
+        {"name": n, "image": deck.image[n], "suit": deck.suit[n], "rank": deck.rank[n]}
+        for n in deck.names
+    ]
+    data = {"box": deck.box, "back": deck.back, "suits": deck.suits}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data | {"decks": decks, "cards": cards}, f)
+    return len(cards) * decks
+
+
+def load_board(client, count, timeout=60):
+    client.send("spread", sort="si_stebbins", delete_used=False, face_up=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = client.send("stats")["result"]
+        if stats["cards"] == count and stats["timers"] == 0:
+            return stats
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"board has {stats['cards']} cards, wanted {count}")
+        time.sleep(0.25)
+
+
+def bench(renderer, rounds, manifest, count):
+    procs, client = launch_overlay(renderer=renderer, deck=manifest)
+    try:
+        load_board(client, count)
+        frames = [client.send("stats")["result"] for _ in range(FRAMES)]
+        samples = run(client, rounds)
+    finally:
+        client.close()
+        stop_overlay(procs)
+
+    print(f"🃏 {renderer}: {frames[-1]['cards']} cards, {frames[-1]['items']} items")
+    report("redraw", [f["frame_ms"] for f in frames])
+    for action in sorted(samples):
+        report(action, samples[action])
+
+
+if __name__ == "__main__":
+    # python card_bench.py [rounds] [renderer ...]   (Xvfb when DISPLAY is unset)
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    fd, manifest = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        count = shoe_manifest(manifest)
+        for renderer in sys.argv[2:] or RENDERERS:
+            bench(renderer, rounds, manifest, count)
+    finally:
+        os.remove(manifest)
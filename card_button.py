@@ -1,13 +1,15 @@
 import tkinter as tk
-from PIL import Image, ImageTk
-import subprocess
+from PIL import ImageTk
+from card_log import log
+import card_cache
+import subprocess, threading
 
 WHITE_IMG = "./image/button/card_button_white.png"
 GRAY_IMG = "./image/button/card_button_gray.png"
 ORANGE_IMG = "./image/button/card_button_orange.png"
 TARGET_SCRIPT = "card.py"
 BG_COLOR = "#000000"
-SCALE = 1
+SCALE = None  # None = from the monitor DPI
 card_program = None
 
 
@@ -15,13 +17,20 @@ def toggle_cards(event=None):
     global card_program
     if card_program and card_program.poll() is None:
         label.config(image=photo_white)
-        print("🟥 close card.py")
+        log.info("🟥 close card.py")
         card_program.terminate()
         card_program = None
     else:
         label.config(image=photo_orange)
-        print("🟩 open card.py")
+        log.info("🟩 open card.py")
         card_program = subprocess.Popen(["pythonw", TARGET_SCRIPT])
+        threading.Thread(target=watch, args=(card_program,), daemon=True).start()
+
+
+def watch(program):
+    # Blocks in the OS until card.py exits, instead of polling it.
+    program.wait()
+    root.event_generate("<<CardClosed>>", when="tail")
 
 
 def press_in(event):
@@ -32,13 +41,12 @@ def press_out(event):
     toggle_cards()
 
 
-def check_card_program():
+def check_card_program(event=None):
     global card_program
     if card_program and card_program.poll() is not None:
         label.config(image=photo_white)
-        print("⬜ card.py is closed")
+        log.info("⬜ card.py is closed")
         card_program = None
-    root.after(500, check_card_program)
 
 
 root = tk.Tk()
@@ -46,20 +54,15 @@ root.overrideredirect(True)
 root.config(bg=BG_COLOR)
 root.wm_attributes("-transparentcolor", BG_COLOR)
 
+scale = SCALE or card_cache.display_scale(root)
 screen_w = root.winfo_screenwidth()
 screen_h = root.winfo_screenheight()
-root.geometry(f"+0+{screen_h - 120}")
+root.geometry(f"+0+{screen_h - round(120 * scale)}")
 
 
-img_white = Image.open(WHITE_IMG)
-img_gray = Image.open(GRAY_IMG)
-img_orange = Image.open(ORANGE_IMG)
-
-if SCALE != 1.0:
-    w, h = img_white.size
-    img_white = img_white.resize((int(w * SCALE), int(h * SCALE)))
-    img_gray = img_gray.resize((int(w * SCALE), int(h * SCALE)))
-    img_orange = img_orange.resize((int(w * SCALE), int(h * SCALE)))
+img_white = card_cache.scaled_image(WHITE_IMG, scale)
+img_gray = card_cache.scaled_image(GRAY_IMG, scale)
+img_orange = card_cache.scaled_image(ORANGE_IMG, scale)
 
 photo_white = ImageTk.PhotoImage(img_white)
 photo_gray = ImageTk.PhotoImage(img_gray)
@@ -69,8 +72,7 @@ photo_orange = ImageTk.PhotoImage(img_orange)
 label = tk.Label(root, image=photo_white, bg=BG_COLOR, bd=0)
 label.pack()
 
-check_card_program()
-
+root.bind("<<CardClosed>>", check_card_program)
 label.bind("<ButtonPress-1>", press_in)
 label.bind("<ButtonRelease-1>", press_out)
 root.mainloop()
@@ -0,0 +1,211 @@
+from PIL import Image
+from card_deck import DeckError, load_deck, scan_deck
+from concurrent.futures import ProcessPoolExecutor
+import hashlib, json, os, sys, threading
+
+CARD_FOLDER = "image/card"
+CACHE_FOLDER = "cache"
+DIGESTS = os.path.join(CACHE_FOLDER, "digests.json")
+FLIP_STEPS = (16, 32)
+SCALE_STEP = 0.25
+RESAMPLE = Image.LANCZOS  # card.py resamples uncached flips with it too
+
+digests = None
+digests_changed = False
+digests_lock = threading.Lock()
+
+
+def flip_widths(width, steps=FLIP_STEPS):
+    widths = set()
+    for total_steps in steps:
+        shrink_steps = total_steps / 2
+        for k in range(1, int(shrink_steps) + 1):
+            widths.add(max(1, int(width * (k / shrink_steps))))
+    return sorted(widths)
+
+
+def file_digest(path):
+    # SHA-1 of an asset, hashed again only when its mtime or size changes, so
+    # a warm start stats the files instead of reading every one of them.
+    global digests, digests_changed
+    stat = os.stat(path)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    with digests_lock:
+        if digests is None:
+            digests = read_digests()
+        entry = digests.get(os.path.abspath(path))
+    if entry and entry[:2] == stamp:
+        return entry[2]
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    with digests_lock:
+        digests[os.path.abspath(path)] = stamp + [digest]
+        digests_changed = True
+    return digest
+
+
+def read_digests():
+    try:
+        with open(DIGESTS, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_digests():
+    global digests_changed
+    with digests_lock:
+        if not digests_changed:
+            return
+        data = dict(digests)
+        digests_changed = False
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    temp = f"{DIGESTS}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp, DIGESTS)
+
+
+def flip_sheet_path(path, size):
+    digest = hashlib.sha1(file_digest(path).encode())
+    digest.update(repr((size, flip_widths(size[0]), RESAMPLE)).encode())
+    return os.path.join(CACHE_FOLDER, f"flip-{digest.hexdigest()}.png")
+
+
+def render_flip_sheet(job):
+    path, size = job
+    target = flip_sheet_path(path, size)
+    if os.path.exists(target):
+        return target
+
+    with Image.open(path) as img:
+        base = img.convert("RGBA").resize(size, RESAMPLE)
+    widths = flip_widths(size[0])
+    sheet = Image.new("RGBA", (sum(widths), size[1]))
+    x = 0
+    for w in widths:
+        sheet.paste(base.resize((w, size[1]), RESAMPLE), (x, 0))
+        x += w
+
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    temp = f"{target}.{os.getpid()}.tmp"
+    sheet.save(temp, format="PNG")
+    os.replace(temp, target)
+    return target
+
+
+def load_flip_sheet(path, size):
+    target = flip_sheet_path(path, size)
+    if not os.path.exists(target):
+        return None
+
+    frames = {}
+    x = 0
+    with Image.open(target) as sheet:
+        for w in flip_widths(size[0]):
+            frames[w] = sheet.crop((x, 0, x + w, size[1]))
+            x += w
+    return frames
+
+
+def display_scale(widget):
+    # Pixels per inch over the 96 dpi the sizes are designed for, snapped to
+    # quarter steps so only a few variants ever land in the cache.
+    scale = widget.winfo_fpixels("1i") / 96
+    return max(1.0, round(scale / SCALE_STEP) * SCALE_STEP)
+
+
+def scale_size(size, scale):
+    return (round(size[0] * scale), round(size[1] * scale))
+
+
+def scaled_path(path, size):
+    digest = hashlib.sha1(file_digest(path).encode())
+    digest.update(repr(size).encode())
+    return os.path.join(CACHE_FOLDER, f"scaled-{digest.hexdigest()}.png")
+
+
+def render_scaled(job):
+    path, size = job
+    target = scaled_path(path, size)
+    if os.path.exists(target):
+        return target
+
+    with Image.open(path) as img:
+        scaled = img.convert("RGBA").resize(size, RESAMPLE)
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    temp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    scaled.save(temp, format="PNG")
+    os.replace(temp, target)
+    return target
+
+
+def load_scaled(path, size):
+    with Image.open(path) as img:
+        if img.size == size:
+            return img.convert("RGBA")
+    with Image.open(render_scaled((path, size))) as img:
+        return img.convert("RGBA")
+
+
+def scaled_image(path, scale):
+    with Image.open(path) as img:
+        size = scale_size(img.size, scale)
+    return load_scaled(path, size)
+
+
+def flip_assets(deck, folder=CARD_FOLDER):
+    # Every image a card can show, by the name card.py loads it under.
+    return {name: os.path.join(folder, name) for name in [*deck.images, deck.back]}
+
+
+def missing_flip_sheets(deck, size, folder=CARD_FOLDER):
+    missing = [
+        name
+        for name, path in flip_assets(deck, folder).items()
+        if not os.path.exists(flip_sheet_path(path, size))
+    ]
+    save_digests()
+    return missing
+
+
+def build_flip_cache(deck, size, folder=CARD_FOLDER, workers=None):
+    jobs = [(path, size) for path in flip_assets(deck, folder).values()]
+    return build(render_flip_sheet, jobs, workers)
+
+
+def build_scaled_cache(deck, size, box_size, folder=CARD_FOLDER, workers=None):
+    jobs = [(path, size) for path in flip_assets(deck, folder).values()]
+    jobs.append((os.path.join(folder, deck.box), box_size))
+    return build(render_scaled, jobs, workers)
+
+
+def build(render, jobs, workers=None):
+    # Hash in this process first and save the digests, so the workers find
+    # them on disk instead of each reading every asset again.
+    for path, _ in jobs:
+        file_digest(path)
+    save_digests()
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(render, jobs))
+
+
+if __name__ == "__main__":
+    # python card_cache.py 74 111 [scale] [box_w box_h]; the deck manifest
+    # comes from CARD_DECK, as for card.py.
+    args = sys.argv[1:]
+    size = (int(args[0]), int(args[1])) if len(args) > 1 else (74, 111)
+    scale = float(args[2]) if len(args) > 2 else 1.0
+    box_size = (int(args[3]), int(args[4])) if len(args) > 4 else (80, 120)
+    try:
+        deck = load_deck(CARD_FOLDER, os.environ.get("CARD_DECK", "deck.json"))
+    except DeckError:
+        deck = scan_deck(CARD_FOLDER)
+    size = scale_size(size, scale)
+    scaled = build_scaled_cache(deck, size, scale_size(box_size, scale))
+    sheets = build_flip_cache(deck, size)
+    print(
+        f"🟩 {len(scaled)} images and {len(sheets)} flip sheets ready for {size[0]}x{size[1]}"
+    )
@@ -0,0 +1,161 @@
+import json, os
+
+CARD_FOLDER = "image/card"
+MANIFEST = "deck.json"
+SUITS = ["spade", "diamond", "club", "heart", "joker"]
+
+
+class DeckError(ValueError):
+    pass
+
+
+class Deck:
+    def __init__(self, cards, suits=None, box="box.png", back="back.png", decks=1):
+        # cards: (name, image, suit, rank) in deck order. Extra decks of a shoe
+        # reuse the images under "name#2", "name#3", ... so names stay unique.
+        self.box = box
+        self.back = back
+        self.names = []
+        self.image = {}
+        self.suit = {}
+        self.rank = {}
+        for copy in range(1, decks + 1):
+            for name, image, suit, rank in cards:
+                if copy > 1:
+                    name = f"{name}#{copy}"
+                if name in self.image:
+                    raise DeckError(f"duplicate card: {name}")
+                self.names.append(name)
+                self.image[name] = image
+                self.suit[name] = suit
+                self.rank[name] = rank
+
+        self.suits = list(suits or dict.fromkeys(self.suit.values()))
+        self.by_suit = {}
+        self.by_rank = {}
+        for name in self.names:
+            self.by_suit.setdefault(self.suit[name], []).append(name)
+            self.by_rank.setdefault(self.rank[name], []).append(name)
+
+        # Card sets are ints with one bit per card index, so filters, used and
+        # unused are single integer operations.
+        self.bit = {name: 1 << i for i, name in enumerate(self.names)}
+        self.rank_masks = {
+            rank: sum(self.bit[n] for n in names)
+            for rank, names in self.by_rank.items()
+        }
+        self.masks = {
+            suit: sum(self.bit[n] for n in names)
+            for suit, names in self.by_suit.items()
+        }
+        full = (1 << len(self.names)) - 1
+        suit = {s: self.masks.get(s, 0) for s in ("spade", "diamond", "club", "heart")}
+        joker = self.masks.get("joker", 0)
+        self.masks |= {
+            "all": full,
+            "joker": joker,
+            "no_joker": suit["spade"] | suit["diamond"] | suit["club"] | suit["heart"],
+            "red": suit["diamond"] | suit["heart"],
+            "black": suit["spade"] | suit["club"],
+        }
+
+    def card(self, suit, rank, nth=0):
+        # The nth card (in deck order) with this suit and rank, whatever its
+        # file is called; jokers are ("joker", "joker", 0) and (..., 1).
+        names = self.names_of(
+            self.masks.get(suit, 0) & self.rank_masks.get(str(rank), 0)
+        )
+        return names[nth] if nth < len(names) else None
+
+    def names_of(self, mask):
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self.names[low.bit_length() - 1])
+            mask ^= low
+        return names
+
+    @property
+    def images(self):
+        return list(dict.fromkeys(self.image.values()))
+
+
+def parse_name(image):
+    # "spade-(12).png" -> ("spade", "12"), "joker-(1).png" -> ("joker", "joker")
+    stem = os.path.splitext(image)[0]
+    suit, _, rest = stem.partition("-(")
+    if suit == "joker":
+        return suit, "joker"
+    return suit, "".join(ch for ch in rest if ch.isdigit())
+
+
+def deck_of(names):
+    return Deck([(n, n, *parse_name(n.partition("#")[0])) for n in names])
+
+
+def scan_deck(folder=CARD_FOLDER):
+    images = [
+        f
+        for f in os.listdir(folder)
+        if f.endswith(".png") and f not in ("box.png", "back.png")
+    ]
+    return deck_of(sorted(images, key=deck_order))
+
+
+def deck_order(image):
+    # Same order as the bundled manifest: spade, diamond, club, heart, joker,
+    # other suits after them, ranks by number.
+    suit, rank = parse_name(image)
+    place = SUITS.index(suit) if suit in SUITS else len(SUITS)
+    return (place, suit, int(rank) if rank.isdigit() else 0, image)
+
+
+def read_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise DeckError(f"{path}: {e}") from None
+    if not isinstance(data, dict):
+        raise DeckError(f"{path}: not a JSON object")
+    decks = data.get("decks", 1)
+    if type(decks) is not int or decks < 1:
+        raise DeckError(f"{path}: decks must be a whole number >= 1: {decks!r}")
+    if not isinstance(data.get("cards", []), list):
+        raise DeckError(f"{path}: cards must be a list")
+
+    cards = []
+    for entry in data.get("cards", []):
+        if isinstance(entry, str):
+            entry = {"image": entry}
+        if not isinstance(entry, dict):
+            raise DeckError(f"{path}: card is not an image name or object: {entry!r}")
+        if not isinstance(entry.get("image"), str):
+            raise DeckError(f"{path}: card without image: {entry}")
+        suit, rank = parse_name(entry["image"])
+        cards.append(
+            (
+                entry.get("name", entry["image"]),
+                entry["image"],
+                entry.get("suit", suit),
+                str(entry.get("rank", rank)),
+            )
+        )
+    if not cards:
+        raise DeckError(f"{path}: no cards")
+
+    return Deck(
+        cards,
+        data.get("suits"),
+        data.get("box", "box.png"),
+        data.get("back", "back.png"),
+        decks,
+    )
+
+
+def load_deck(folder=CARD_FOLDER, manifest=MANIFEST):
+    # manifest is relative to folder, or an absolute path to one elsewhere.
+    path = os.path.join(folder, manifest)
+    if os.path.exists(path):
+        return read_manifest(path)
+    return scan_deck(folder)
@@ -0,0 +1,59 @@
+from card_remote import launch_overlay, stop_overlay
+import glob, sys, time
+
+IDLE_SECONDS = 10
+MAX_WAKEUPS = 1.0  # per second, across all threads of card.py
+
+
+def context_switches(pid):
+    # Every time a thread of the process is scheduled back in after sleeping
+    # (or is preempted) one of these counters goes up. Linux only.
+    total = 0
+    for status in glob.glob(f"/proc/{pid}/task/*/status"):
+        try:
+            with open(status) as f:
+                for line in f:
+                    if line.startswith(("voluntary_ctxt", "nonvoluntary_ctxt")):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+def settle(client, timeout=15):
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = client.send("stats")["result"]
+        if stats["timers"] == 0 or time.monotonic() > deadline:
+            return stats
+        time.sleep(0.25)
+
+
+def idle_wakeups(client, pid, seconds=IDLE_SECONDS):
+    client.send("spread", sort="si_stebbins")
+    time.sleep(4)
+    client.send("spawn")
+    stats = settle(client)
+
+    # No IPC while measuring: the remote thread sleeps in select like the rest.
+    before = context_switches(pid)
+    time.sleep(seconds)
+    after = context_switches(pid)
+    return stats["timers"], (after - before) / seconds
+
+
+if __name__ == "__main__":
+    # python card_idle.py [seconds]   (starts Xvfb when DISPLAY is not set)
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else IDLE_SECONDS
+    procs, client = launch_overlay()
+    try:
+        timers, rate = idle_wakeups(client, procs[-1].pid, seconds)
+    finally:
+        client.close()
+        stop_overlay(procs)
+
+    print(f"🃏 timers={timers} wakeups={rate:.2f}/s over {seconds:g}s")
+    if timers or rate > MAX_WAKEUPS:
+        print("🟥 card.py is not idle")
+        sys.exit(1)
+    print("🟩 card.py is idle")
@@ -0,0 +1,99 @@
+from card_remote import launch_overlay, report, stop_overlay
+import collections, sys, time
+
+CTRL, SHIFT = 0x4, 0x1
+# (keysym, modifier state, seconds to wait afterwards)
+SCRIPT = [
+    ("e", 0, 0.3),
+    ("f", 0, 0.5),
+    ("d", 0, 0.5),
+    ("s", 0, 2.0),
+    ("t", 0, 0.5),
+    ("t", 0, 0.5),
+    ("f", CTRL, 3.5),
+    ("e", CTRL, 1.0),
+    ("e", CTRL, 1.0),
+    ("u", 0, 0.5),
+    ("d", CTRL, 3.5),
+    ("u", 0, 0.5),
+    ("u", SHIFT, 0.5),
+    ("k", 0, 0.5),
+    ("d", CTRL | SHIFT, 1.0),
+]
+
+
+class LatencyProbe:
+    def __init__(self, widget, capacity=1000, timeout_ms=1000):
+        self.widget = widget
+        self.capacity = capacity
+        self.timeout = timeout_ms / 1000
+        self.samples = {}
+        self.waiting = []
+        self.pending = []
+
+    def stamp(self, action, start=None):
+        # Called first thing in an input handler. The sample stays open until
+        # the canvas first changes because of it, which may be in the handler
+        # or later: render() after the board changes, the first frame of an
+        # arrange or stack, the first card of a 50 ms spawn chain.
+        self.waiting.append((action, start or time.perf_counter()))
+
+    def changed(self):
+        # Called where the canvas is changed. Tk draws the change in its idle
+        # handlers, so the first idle pass after it, forced to completion, is
+        # when it reaches the screen. An action that changed nothing within
+        # the timeout is dropped instead of ending at an unrelated change.
+        if not self.waiting:
+            return
+        now = time.perf_counter()
+        fresh = [(a, s) for a, s in self.waiting if now - s < self.timeout]
+        self.waiting = []
+        if fresh and not self.pending:
+            self.widget.after_idle(self.flushed)
+        self.pending += fresh
+
+    def flushed(self):
+        self.widget.update_idletasks()
+        now = time.perf_counter()
+        for action, start in self.pending:
+            if action not in self.samples:
+                self.samples[action] = collections.deque(maxlen=self.capacity)
+            self.samples[action].append((now - start) * 1000)
+        self.pending = []
+
+    def dump(self, clear=False):
+        samples = {action: list(s) for action, s in self.samples.items()}
+        if clear:
+            self.samples = {}
+        return samples
+
+
+def key_name(keysym, state):
+    ctrl = "ctrl+" if state & CTRL else ""
+    shift = "shift+" if state & SHIFT else ""
+    return f"{ctrl}{shift}{keysym.lower()}"
+
+
+def run(client, rounds=5):
+    client.send("latency", clear=True)
+    for _ in range(rounds):
+        for keysym, state, wait in SCRIPT:
+            client.send("key", keysym=keysym, state=state)
+            time.sleep(wait)
+        client.send("reset")
+        time.sleep(4)
+    return client.send("latency")["result"]
+
+
+if __name__ == "__main__":
+    # python card_latency.py [rounds]   (starts Xvfb when DISPLAY is not set)
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    procs, client = launch_overlay()
+    try:
+        samples = run(client, rounds)
+    finally:
+        client.close()
+        stop_overlay(procs)
+
+    for action in sorted(samples):
+        report(action, samples[action])
@@ -0,0 +1,83 @@
+import math, time
+
+ANGLE_STEP = 2
+GRID_GAP = 10
+
+
+def ribbon(n, spacing, size):
+    return [(i * spacing, 0, 0) for i in range(n)]
+
+
+def fan(n, spacing, size):
+    # Cards pivot around one point below the spread, like a hand-held fan.
+    sweep = math.radians(min(160, 4 * (n - 1)))
+    radius = size[1] * 1.5
+    return pivot(n, spacing, radius, sweep)
+
+
+def arc(n, spacing, size):
+    # A shallow bow with the same width as the ribbon.
+    sweep = math.radians(60)
+    radius = max(size[1] * 2, (n - 1) * spacing)
+    return pivot(n, spacing, radius, sweep)
+
+
+def pivot(n, spacing, radius, sweep):
+    center = (n - 1) * spacing / 2
+    places = []
+    for i in range(n):
+        a = (i / (n - 1) - 0.5) * sweep if n > 1 else 0
+        x = center + radius * math.sin(a)
+        y = radius - radius * math.cos(a)
+        places.append((x, y, math.degrees(a)))
+    return places
+
+
+def circle(n, spacing, size):
+    center = (n - 1) * spacing / 2
+    radius = max(size[1], n * spacing / (2 * math.pi))
+    places = []
+    for i in range(n):
+        a = 2 * math.pi * i / n
+        places.append(
+            (center + radius * math.sin(a), -radius * math.cos(a), math.degrees(a))
+        )
+    return places
+
+
+def grid(n, spacing, size):
+    w, h = size[0] + GRID_GAP, size[1] + GRID_GAP
+    cols = max(1, min(n, math.ceil(math.sqrt(n * 2.5))))
+    rows = math.ceil(n / cols)
+    center = (n - 1) * spacing / 2
+    return [
+        (
+            center + (i % cols - (cols - 1) / 2) * w,
+            (i // cols - (rows - 1) / 2) * h,
+            0,
+        )
+        for i in range(n)
+    ]
+
+
+LAYOUTS = {"ribbon": ribbon, "fan": fan, "arc": arc, "circle": circle, "grid": grid}
+
+
+def arrange(name, n, x, y, spacing, size):
+    # Centres and clockwise angles for n cards, with (x, y) where the first
+    # card of a plain ribbon would sit. Angles snap to ANGLE_STEP so rotated
+    # images can be shared between cards.
+    places = LAYOUTS[name](n, spacing, size)
+    return [
+        (x + dx, y + dy, round(a / ANGLE_STEP) * ANGLE_STEP % 360)
+        for dx, dy, a in places
+    ]
+
+
+if __name__ == "__main__":
+    for name in LAYOUTS:
+        start = time.perf_counter()
+        for _ in range(1000):
+            arrange(name, 216, 0, 0, 20, (74, 111))
+        ms = time.perf_counter() - start  # seconds per 1000 runs = ms per run
+        print(f"🟩 {name:<7} 216 cards in {ms:.3f} ms")
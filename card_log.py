@@ -0,0 +1,69 @@
+import atexit, collections, os, sys, threading, time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+
+def ignore(*args):
+    pass
+
+
+class Logger:
+    def __init__(self, level=INFO, capacity=1000, stream=None):
+        self.records = collections.deque(maxlen=capacity)
+        self.pending = collections.deque()
+        self.stream = stream
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.set_level(level)
+
+        threading.Thread(target=self.run, daemon=True).start()
+        atexit.register(self.flush)
+
+    def set_level(self, level):
+        # Disabled levels are swapped for a no-op, so a hot path pays one
+        # call and never formats its arguments.
+        self.level = level
+        for name, value in LEVELS.items():
+            if value >= level:
+                setattr(self, name, lambda msg, *args, v=value: self.log(v, msg, args))
+            else:
+                setattr(self, name, ignore)
+
+    def log(self, level, msg, args):
+        record = (time.time(), level, msg, args)
+        self.records.append(record)
+        self.pending.append(record)
+        self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        stream = self.stream or sys.stdout
+        with self.lock:
+            while self.pending:
+                stamp, level, msg, args = self.pending.popleft()
+                if stream is None:
+                    continue
+                try:
+                    stream.write(f"{self.format(stamp, level, msg, args)}\n")
+                except (OSError, ValueError):
+                    return
+            if stream is not None:
+                stream.flush()
+
+    def format(self, stamp, level, msg, args):
+        clock = time.strftime("%H:%M:%S", time.localtime(stamp))
+        name = next(k for k, v in LEVELS.items() if v == level).upper()
+        text = msg % args if args else msg
+        return f"{clock}.{int(stamp * 1000) % 1000:03d} {name:<7} {text}"
+
+    def dump(self):
+        return [self.format(*record) for record in self.records]
+
+
+log = Logger(LEVELS.get(os.environ.get("CARD_LOG_LEVEL", "info").lower(), INFO))
@@ -0,0 +1,279 @@
+from card_deck import load_deck
+from card_stack import StackIndex, order_cards
+import collections, itertools, random, time
+
+
+class CardState:
+    __slots__ = ("id", "name", "x", "y", "face_up", "angle", "group", "in_spread")
+
+    def __init__(self, id, name, x, y, face_up, angle=0):
+        self.id = id
+        self.name = name
+        self.x, self.y = x, y
+        self.face_up = face_up
+        self.angle = angle
+        self.group = None
+        self.in_spread = False
+
+
+class GroupState:
+    __slots__ = ("id", "sort", "order", "index", "x", "y", "cards", "stacked", "layout")
+
+    def __init__(self, id, sort, order, x, y, index=None):
+        self.id = id
+        self.sort = sort
+        self.order = order
+        self.index = index or StackIndex(order)
+        self.x, self.y = x, y
+        self.cards = []
+        self.stacked = False
+        self.layout = "ribbon"
+
+
+class Board:
+    def __init__(self, deck, notify=None):
+        self.deck = deck
+        self.bit = deck.bit
+        self.all_cards = frozenset(deck.names)
+        self.used = 0
+        self.free_mask = None
+        self.free_names = []
+        self.cards = {}
+        self.by_name = {}
+        self.groups = {}
+        self.target = None
+        self.diffs = []
+        self.notify = notify
+        self.ids = itertools.count(1)
+
+    def changed(self, kind, key):
+        if not self.diffs and self.notify:
+            self.notify()
+        self.diffs.append((kind, key))
+
+    def flush(self):
+        diffs, self.diffs = self.diffs, []
+        return diffs
+
+    @property
+    def unused(self):
+        # Rebuilt from the bitmask only when used has changed since last time.
+        free = self.deck.masks["all"] & ~self.used
+        if free != self.free_mask:
+            self.free_mask = free
+            self.free_names = self.deck.names_of(free)
+        return self.free_names
+
+    def available(self, group="all", delete_used=True, rank=None):
+        mask = self.deck.masks.get(group, 0)
+        if rank is not None:
+            mask &= self.deck.rank_masks.get(rank, 0)
+        if not delete_used:
+            mask &= ~self.used
+        return self.deck.names_of(mask)
+
+    def spawn(self, name, x, y, face_up=False, angle=0):
+        if name in self.by_name:
+            self.remove(self.by_name[name])
+
+        card = CardState(next(self.ids), name, x, y, face_up, angle)
+        self.cards[card.id] = card
+        self.by_name[name] = card
+        self.used |= self.bit[name]
+        self.changed("spawn", card.id)
+        return card
+
+    def remove(self, card):
+        self.leave_group(card)
+        del self.cards[card.id]
+        del self.by_name[card.name]
+        self.used &= ~self.bit[card.name]
+        self.changed("delete", card.id)
+
+    def move(self, card, x, y):
+        card.x, card.y = x, y
+        self.changed("move", card.id)
+
+    def set_face(self, card, face_up):
+        if card.face_up != face_up:
+            card.face_up = face_up
+            self.changed("image", card.id)
+
+    def set_angle(self, card, angle):
+        if card.angle != angle:
+            card.angle = angle
+            self.changed("image", card.id)
+
+    def flip(self, card):
+        self.set_face(card, not card.face_up)
+
+    def swap(self, card, target_name):
+        other = self.by_name.get(target_name)
+        if other is card:
+            return
+        if other:
+            other.name, card.name = card.name, other.name
+            self.by_name[other.name] = other
+            self.changed("image", other.id)
+        else:
+            del self.by_name[card.name]
+            self.used &= ~self.bit[card.name]
+            self.used |= self.bit[target_name]
+            card.name = target_name
+        self.by_name[card.name] = card
+        self.changed("image", card.id)
+
+    def force(self, target_name):
+        # An unknown name would fail only at the next flip, half-way through
+        # swap() and with the target still set.
+        if target_name is not None and target_name not in self.bit:
+            raise ValueError(f"unknown card: {target_name}")
+        self.target = target_name
+        card = self.by_name.get(target_name)
+        if card:
+            self.set_face(card, False)
+
+    def take_target(self, card):
+        if not card.face_up and self.target:
+            self.swap(card, self.target)
+            self.target = None
+
+    def create_group(self, names, sort, x, y):
+        group = GroupState(
+            next(self.ids), sort, order_cards(self.deck, names, sort), x, y
+        )
+        self.groups[group.id] = group
+        return group
+
+    def join_group(self, card, group):
+        card.group = group.id
+        card.in_spread = True
+        group.cards.append(card.id)
+
+    def leave_group(self, card):
+        group = self.groups.get(card.group)  # type: ignore
+        card.group = None
+        card.in_spread = False
+        if group:
+            group.cards.remove(card.id)
+            if not group.cards:
+                del self.groups[group.id]
+        return group
+
+    def remove_group(self, group):
+        for card_id in list(group.cards):
+            self.remove(self.cards[card_id])
+        self.groups.pop(group.id, None)
+
+    def stack(self, group):
+        group.stacked = not group.stacked
+        return group.stacked
+
+    def move_group(self, group, dx, dy):
+        group.x += dx
+        group.y += dy
+        for card_id in group.cards:
+            card = self.cards[card_id]
+            self.move(card, card.x + dx, card.y + dy)
+
+    def snapshot(self):
+        # Flat tuples of plain values; group orders and indexes never change
+        # after creation, so every snapshot shares them instead of copying.
+        cards = tuple(
+            (c.id, c.name, c.x, c.y, c.face_up, c.angle, c.group, c.in_spread)
+            for c in self.cards.values()
+        )
+        groups = tuple(
+            (
+                g.id,
+                g.sort,
+                g.order,
+                g.index,
+                g.x,
+                g.y,
+                tuple(g.cards),
+                g.stacked,
+                g.layout,
+            )
+            for g in self.groups.values()
+        )
+        return cards, groups, self.target
+
+    def restore(self, snapshot):
+        cards, groups, self.target = snapshot
+        self.cards = {}
+        self.by_name = {}
+        for id, name, x, y, face_up, angle, group, in_spread in cards:
+            card = CardState(id, name, x, y, face_up, angle)
+            card.group, card.in_spread = group, in_spread
+            self.cards[id] = card
+            self.by_name[name] = card
+        self.used = sum(self.bit[name] for name in self.by_name)
+
+        self.groups = {}
+        for id, sort, order, index, x, y, members, stacked, layout in groups:
+            group = GroupState(id, sort, order, x, y, index)
+            group.cards = list(members)
+            group.stacked = stacked
+            group.layout = layout
+            self.groups[id] = group
+        self.diffs = []
+
+
+class History:
+    def __init__(self, board, size=50):
+        self.board = board
+        self.undo_stack = collections.deque(maxlen=size)
+        self.redo_stack = collections.deque(maxlen=size)
+
+    def record(self):
+        self.undo_stack.append(self.board.snapshot())
+        self.redo_stack.clear()
+
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        self.redo_stack.append(self.board.snapshot())
+        self.board.restore(self.undo_stack.pop())
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        self.undo_stack.append(self.board.snapshot())
+        self.board.restore(self.redo_stack.pop())
+        return True
+
+
+def simulate(deck, operations=1_000_000, seed=0):
+    rng = random.Random(seed)
+    names = deck.names
+    board = Board(deck)
+    group = board.create_group(board.available(), "si_stebbins", 0, 0)
+    for i, name in enumerate(group.order):
+        board.join_group(board.spawn(name, i * 20, 0), group)
+
+    cards = list(board.cards.values())
+    for _ in range(operations):
+        card = rng.choice(cards)
+        op = rng.random()
+        if op < 0.4:
+            board.flip(card)
+        elif op < 0.6:
+            board.swap(card, rng.choice(names))
+        elif op < 0.8:
+            board.force(rng.choice(names))
+            board.take_target(card)
+        else:
+            board.move(card, card.x + 1, card.y)
+        if len(board.diffs) > 4096:
+            board.flush()
+    return board
+
+
+if __name__ == "__main__":
+    deck = load_deck()
+    start = time.perf_counter()
+    simulate(deck)
+    seconds = time.perf_counter() - start
+    print(f"🟩 1000000 operations in {seconds:.2f}s ({1_000_000 / seconds:,.0f}/s)")
@@ -0,0 +1,195 @@
+from card_log import log
+import asyncio, json, os, queue, shutil, socket, statistics, subprocess, sys
+import threading, time
+
+HOST = "127.0.0.1"
+PORT = 47300
+
+
+class RemoteServer:
+    def __init__(self, widget, execute, host=HOST, port=PORT):
+        self.widget = widget
+        self.execute = execute
+        self.host = host
+        self.port = port
+        self.commands = queue.Queue()
+        self.loop = None
+
+        self.widget.bind("<<RemoteCommand>>", self.drain)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except OSError as e:
+            log.warning("⚠️ Remote control disabled: %s", e)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        log.info("🟩 Remote control on %s:%s", self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        while line := await reader.readline():
+            received = time.perf_counter()
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply = {"ok": False, "error": "invalid json"}
+            else:
+                future = self.loop.create_future()  # type: ignore
+                self.commands.put((request, received, future))
+                # Tk marshals calls from other threads onto its own loop, so
+                # this wakes mainloop at once instead of polling the queue.
+                self.widget.event_generate("<<RemoteCommand>>", when="tail")
+                reply = await future
+
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+        writer.close()
+
+    def drain(self, event=None):
+        while True:
+            try:
+                request, received, future = self.commands.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                result = self.execute(request)
+                self.widget.update_idletasks()
+                reply = {"ok": True, "result": result}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            reply["latency_ms"] = (time.perf_counter() - received) * 1000
+            self.loop.call_soon_threadsafe(future.set_result, reply)  # type: ignore
+
+
+class RemoteClient:
+    def __init__(self, host=HOST, port=PORT, timeout=5):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile("rwb")
+
+    def send(self, cmd, **args):
+        self.file.write((json.dumps({"cmd": cmd, **args}) + "\n").encode())
+        self.file.flush()
+        reply = json.loads(self.file.readline())
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+# (command, arguments, seconds to let its animation finish)
+BENCH = [
+    ("spawn", {}, 0.5),
+    ("spread", {"sort": "si_stebbins"}, 3.0),
+    ("flip", {"target": "group"}, 1.5),
+    ("layout", {}, 0.5),
+    ("stats", {}, 0),
+    ("delete", {"target": "group"}, 4.0),
+    ("undo", {}, 0.5),
+    ("reset", {}, 4.0),
+]
+
+
+def launch_overlay(xvfb=None, display=":99", timeout=20, renderer=None, deck=None):
+    env = os.environ.copy()
+    if renderer:
+        env["CARD_RENDERER"] = renderer
+    if deck:
+        env["CARD_DECK"] = deck
+    procs = []
+    if xvfb or (xvfb is None and "DISPLAY" not in env):
+        if not shutil.which("Xvfb"):
+            raise RuntimeError("Xvfb is not installed")
+        procs.append(
+            subprocess.Popen(["Xvfb", display, "-screen", "0", "1920x1080x24"])
+        )
+        env["DISPLAY"] = display
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    procs.append(subprocess.Popen([sys.executable, "card.py"], cwd=here, env=env))
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return procs, RemoteClient()
+        except OSError:
+            if time.monotonic() > deadline or procs[-1].poll() is not None:
+                stop_overlay(procs)
+                raise RuntimeError("card.py did not start its remote control")
+            time.sleep(0.2)
+
+
+def stop_overlay(procs):
+    for proc in reversed(procs):
+        proc.terminate()
+        proc.wait()
+
+
+def parse_value(text):
+    if text in ("true", "false"):
+        return text == "true"
+    if text == "none":
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(
+        f"{name:>8}: n={len(samples)} min={samples[0]:.3f} "
+        f"median={statistics.median(samples):.3f} p95={p95:.3f} "
+        f"max={samples[-1]:.3f} ms"
+    )
+
+
+def bench(client, count=200, rounds=5):
+    command, round_trip = [], []
+    for _ in range(count):
+        start = time.perf_counter()
+        reply = client.send("ping")
+        round_trip.append((time.perf_counter() - start) * 1000)
+        command.append(reply["latency_ms"])
+
+    report("canvas", command)
+    report("round", round_trip)
+
+    # Real commands: time from receiving each one to its first canvas flush.
+    samples = {}
+    for _ in range(rounds):
+        for cmd, args, wait in BENCH:
+            reply = client.send(cmd, **args)
+            samples.setdefault(cmd, []).append(reply["latency_ms"])
+            time.sleep(wait)
+    for cmd, values in samples.items():
+        report(cmd, values)
+
+
+if __name__ == "__main__":
+    # python card_remote.py spread sort=si_stebbins face_up=true
+    # python card_remote.py bench 500
+    if len(sys.argv) < 2:
+        print("usage: card_remote.py <command> [key=value ...] | bench [count]")
+        sys.exit(1)
+
+    client = RemoteClient()
+    if sys.argv[1] == "bench":
+        bench(client, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    else:
+        args = dict(arg.split("=", 1) for arg in sys.argv[2:])
+        reply = client.send(sys.argv[1], **{k: parse_value(v) for k, v in args.items()})
+        print(f"🃏 {reply['result']} ({reply['latency_ms']:.3f} ms)")
+    client.close()
@@ -0,0 +1,322 @@
+import tkinter as tk
+from PIL import Image, ImageDraw, ImageFont, ImageTk
+
+TILE = 256
+
+
+class Item:
+    def __init__(self, kind, coords, options):
+        self.kind = kind
+        self.coords = [float(c) for c in coords]
+        self.tags = options.pop("tags", ())
+        if isinstance(self.tags, str):
+            self.tags = (self.tags,)
+        self.options = options
+        self.img = None
+        self.font = None
+
+
+class SoftCanvas(tk.Canvas):
+    # Takes the item calls card.py makes on a tk.Canvas (create_image,
+    # create_rectangle, create_text, coords, itemconfig, move, delete,
+    # tag_raise, tag_lower, find_*, bbox), but keeps the items in Python.
+    # Changes mark the screen tiles they touch. Once per idle pass only those
+    # tiles are composited into the frame buffer and blitted to Tk.
+    def __init__(self, master, source=None, **options):
+        super().__init__(master, **options)
+        self.source = source or ImageTk.getimage
+        self.width = int(options.get("width", 1))
+        self.height = int(options.get("height", 1))
+        self.bg = options.get("bg", "#000000")
+        self.items = {}
+        self.order = []
+        self.next_id = 1
+        self.fonts = {}
+        self.damage = set()
+        self.redraw_job = None
+        self.frame = Image.new("RGBA", (self.width, self.height), self.bg)
+        self.tiles = {}
+        for ty in range(0, self.height, TILE):
+            for tx in range(0, self.width, TILE):
+                box = (tx, ty, min(tx + TILE, self.width), min(ty + TILE, self.height))
+                photo = ImageTk.PhotoImage(self.frame.crop(box))
+                super().create_image(tx, ty, image=photo, anchor="nw")
+                self.tiles[tx // TILE, ty // TILE] = (box, photo)
+
+    def create_image(self, x, y, **options):
+        return self.add(Item("image", (x, y), options))
+
+    def create_rectangle(self, x1, y1, x2, y2, **options):
+        return self.add(Item("rectangle", (x1, y1, x2, y2), options))
+
+    def create_text(self, x, y, **options):
+        return self.add(Item("text", (x, y), options))
+
+    def add(self, item):
+        item_id = self.next_id
+        self.next_id += 1
+        self.items[item_id] = item
+        self.order.append(item_id)
+        self.load(item)
+        self.touch(item)
+        return item_id
+
+    def load(self, item):
+        if item.kind == "image" and "image" in item.options:
+            item.img = self.source(item.options["image"])
+        elif item.kind == "text":
+            item.font = self.font(item.options.get("font", ("Arial", 10)))
+
+    def font(self, spec):
+        if spec not in self.fonts:
+            # Tk font sizes are points; PIL wants pixels.
+            family, size = spec[0], spec[1]
+            px = max(1, round(size * float(self.tk.call("tk", "scaling"))))
+            for name in (family, f"{family.lower()}.ttf", "DejaVuSans.ttf"):
+                try:
+                    self.fonts[spec] = ImageFont.truetype(name, px)
+                    break
+                except OSError:
+                    pass
+            else:
+                self.fonts[spec] = ImageFont.load_default(px)
+        return self.fonts[spec]
+
+    def ids(self, tag):
+        if tag is None:
+            return []
+        if isinstance(tag, int) or str(tag).isdigit():
+            return [int(tag)] if int(tag) in self.items else []
+        if tag == "all":
+            return list(self.order)
+        if tag == "current":
+            x = self.winfo_pointerx() - self.winfo_rootx()
+            y = self.winfo_pointery() - self.winfo_rooty()
+            found = self.find_overlapping(x, y, x, y)
+            return list(found[-1:])
+        return [i for i in self.order if tag in self.items[i].tags]
+
+    def coords(self, tag, *args):
+        ids = self.ids(tag)
+        if not args:
+            return list(self.items[ids[0]].coords) if ids else []
+        if len(args) == 1:
+            args = args[0]
+        for item_id in ids:
+            item = self.items[item_id]
+            self.touch(item)
+            item.coords = [float(c) for c in args]
+            self.touch(item)
+
+    def move(self, tag, dx, dy):
+        for item_id in self.ids(tag):
+            item = self.items[item_id]
+            self.touch(item)
+            item.coords = [c + (dy if i % 2 else dx) for i, c in enumerate(item.coords)]
+            self.touch(item)
+
+    def itemconfigure(self, tag, **options):
+        for item_id in self.ids(tag):
+            item = self.items[item_id]
+            self.touch(item)
+            item.options.update(options)
+            if "image" in options or "font" in options:
+                self.load(item)
+            self.touch(item)
+
+    itemconfig = itemconfigure
+
+    def delete(self, *tags):
+        for tag in tags:
+            for item_id in self.ids(tag):
+                self.touch(self.items.pop(item_id))
+                self.order.remove(item_id)
+
+    def tag_raise(self, tag, above=None):
+        self.restack(tag, above, 1)
+
+    def tag_lower(self, tag, below=None):
+        self.restack(tag, below, 0)
+
+    lift = tag_raise
+    lower = tag_lower
+
+    def restack(self, tag, other, after):
+        ids = self.ids(tag)
+        others = [i for i in self.ids(other) if i not in ids]
+        if other is not None and not others:
+            return  # Tk ignores a reference item that does not exist.
+        for item_id in ids:
+            self.order.remove(item_id)
+        if other is None:
+            at = len(self.order) if after else 0
+        else:
+            at = self.order.index(others[-1 if after else 0]) + after
+        self.order[at:at] = ids
+        for item_id in ids:
+            self.touch(self.items[item_id])
+
+    def find_all(self):
+        return tuple(self.order)
+
+    def find_withtag(self, tag):
+        return tuple(self.ids(tag))
+
+    def find_overlapping(self, x1, y1, x2, y2):
+        found = []
+        for item_id in self.order:
+            item = self.items[item_id]
+            if item.options.get("state") == "hidden":
+                continue
+            bx1, by1, bx2, by2 = self.box(item)
+            if bx1 <= x2 and x1 <= bx2 and by1 <= y2 and y1 <= by2:
+                found.append(item_id)
+        return tuple(found)
+
+    def bbox(self, *tags):
+        # Like Tk, hidden items take no space.
+        boxes = [
+            self.box(self.items[i])
+            for tag in tags
+            for i in self.ids(tag)
+            if self.items[i].options.get("state") != "hidden"
+        ]
+        if not boxes:
+            return None
+        return (
+            int(min(b[0] for b in boxes)),
+            int(min(b[1] for b in boxes)),
+            int(max(b[2] for b in boxes)) + 1,
+            int(max(b[3] for b in boxes)) + 1,
+        )
+
+    def box(self, item):
+        if item.kind == "rectangle":
+            x1, y1, x2, y2 = item.coords
+            w = item.options.get("width", 1) / 2
+            return (min(x1, x2) - w, min(y1, y2) - w, max(x1, x2) + w, max(y1, y2) + w)
+        x, y = item.coords[:2]
+        if item.kind == "text":
+            left, top, right, bottom = item.font.getbbox(
+                item.options.get("text", ""), anchor="mm"
+            )
+            return (x + left, y + top, x + right, y + bottom)
+        if item.img is None:
+            return (x, y, x, y)
+        w, h = item.img.size
+        if item.options.get("anchor", "center") == "nw":
+            return (x, y, x + w, y + h)
+        return (x - w // 2, y - h // 2, x - w // 2 + w, y - h // 2 + h)
+
+    def touch(self, item):
+        # Old and new bounds of every change mark the tiles under them, so
+        # two changes far apart never redraw the screen between them.
+        x1, y1, x2, y2 = self.box(item)
+        cols = range(max(0, int(x1 - 1) // TILE), int(x2 + 2) // TILE + 1)
+        rows = range(max(0, int(y1 - 1) // TILE), int(y2 + 2) // TILE + 1)
+        self.damage.update((c, r) for c in cols for r in rows if (c, r) in self.tiles)
+        if self.damage and self.redraw_job is None:
+            self.redraw_job = self.after_idle(self.redraw)
+
+    def redraw(self):
+        self.redraw_job = None
+        damage, self.damage = self.damage, set()
+        shown = []
+        for item_id in self.order:
+            item = self.items[item_id]
+            if item.options.get("state") != "hidden":
+                shown.append((item, self.box(item)))
+
+        for key in damage:
+            box, photo = self.tiles[key]
+            x1, y1, x2, y2 = box
+            region = Image.new("RGBA", (x2 - x1, y2 - y1), self.bg)
+            draw = ImageDraw.Draw(region)
+            for item, (bx1, by1, bx2, by2) in shown:
+                if bx1 >= x2 or x1 >= bx2 or by1 >= y2 or y1 >= by2:
+                    continue
+                if item.kind == "image" and item.img is not None:
+                    self.paint_image(region, item, x1, y1)
+                elif item.kind == "rectangle":
+                    self.paint_rectangle(draw, item, x1, y1)
+                elif item.kind == "text":
+                    x, y = item.coords[:2]
+                    draw.text(
+                        (x - x1, y - y1),
+                        item.options.get("text", ""),
+                        fill=item.options.get("fill", "#000000"),
+                        font=item.font,
+                        anchor="mm",
+                    )
+            self.frame.paste(region, (x1, y1))
+            photo.paste(region)
+
+    def paint_image(self, region, item, ox, oy):
+        # alpha_composite does not clip, so crop the source to the region.
+        left, top, _, _ = self.box(item)
+        left, top = int(left) - ox, int(top) - oy
+        w, h = item.img.size
+        sx, sy = max(0, -left), max(0, -top)
+        ex, ey = min(w, region.width - left), min(h, region.height - top)
+        if sx < ex and sy < ey:
+            region.alpha_composite(item.img, (left + sx, top + sy), (sx, sy, ex, ey))
+
+    def paint_rectangle(self, draw, item, ox, oy):
+        x1, y1, x2, y2 = item.coords
+        x1, x2 = sorted((x1 - ox, x2 - ox))
+        y1, y2 = sorted((y1 - oy, y2 - oy))
+        fill = item.options.get("fill") or None
+        outline = item.options.get("outline", "#000000") or None
+        width = round(item.options.get("width", 1))
+        if fill:
+            draw.rectangle((x1, y1, x2, y2), fill=fill)
+        if not outline or width < 1:
+            return
+
+        # Tk centres the outline on the edge.
+        half = width / 2
+        box = (x1 - half, y1 - half, x2 + half, y2 + half)
+        dash = item.options.get("dash")
+        if not dash:
+            draw.rectangle(box, outline=outline, width=width)
+            return
+        for start, end in (
+            ((x1, y1), (x2, y1)),
+            ((x2, y1), (x2, y2)),
+            ((x2, y2), (x1, y2)),
+            ((x1, y2), (x1, y1)),
+        ):
+            dashed_line(draw, start, end, dash, outline, width)
+
+
+def dashed_line(draw, start, end, dash, fill, width):
+    (sx, sy), (ex, ey) = start, end
+    length = max(abs(ex - sx), abs(ey - sy))
+    if not length:
+        return
+    ux, uy = (ex - sx) / length, (ey - sy) / length
+    pos, i = 0.0, 0
+    while pos < length:
+        run = dash[i % len(dash)]
+        if i % 2 == 0:
+            stop = min(length, pos + run)
+            draw.line(
+                (sx + ux * pos, sy + uy * pos, sx + ux * stop, sy + uy * stop),
+                fill=fill,
+                width=width,
+            )
+        pos += run
+        i += 1
+
+
+RENDERERS = ("tk", "soft")
+
+
+def make_canvas(renderer, master, source=None, **options):
+    # "tk": one Tk canvas item per card, star and outline.
+    # "soft": SoftCanvas, the same calls composited by PIL into one buffer.
+    if renderer == "tk":
+        return tk.Canvas(master, **options)
+    if renderer == "soft":
+        return SoftCanvas(master, source, **options)
+    raise ValueError(f"unknown renderer: {renderer}")
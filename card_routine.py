@@ -0,0 +1,122 @@
+from card_layout import LAYOUTS
+from card_log import log
+from card_remote import parse_value
+from card_stack import SORTS
+import shlex, time
+
+FLIP_TARGETS = ("card", "group", "all")
+COMMANDS = {
+    "spawn": (),
+    "spread": ("group", "sort", "delete_used", "face_up"),
+    "target": ("name",),
+    "flip": ("target", "name"),
+    "delete": ("target", "name"),
+    "reset": (),
+    "layout": ("style",),
+}
+
+
+class RoutineError(ValueError):
+    pass
+
+
+def compile_routine(text, deck):
+    # Groups are whatever the deck has masks for, so manifest suits work too.
+    deck_names = set(deck.names)
+    steps = []
+    offset = 0.0
+
+    for number, line in enumerate(text.splitlines(), 1):
+        words = shlex.split(line, comments=True)
+        if not words:
+            continue
+
+        cmd, args = words[0], words[1:]
+        if cmd == "wait":
+            try:
+                seconds = float(args[0]) if len(args) == 1 else -1
+            except ValueError:
+                seconds = -1
+            if seconds < 0:
+                raise RoutineError(f"line {number}: wait needs one duration >= 0")
+            offset += seconds * 1000
+            continue
+
+        if cmd not in COMMANDS:
+            raise RoutineError(f"line {number}: unknown command {cmd!r}")
+
+        request = {"cmd": cmd}
+        for arg in args:
+            key, sep, value = arg.partition("=")
+            if not sep or key not in COMMANDS[cmd]:
+                raise RoutineError(f"line {number}: bad argument {arg!r} for {cmd}")
+            request[key] = parse_value(value)
+
+        check = {
+            "group": deck.masks,
+            "sort": SORTS,
+            "style": LAYOUTS,
+            "target": FLIP_TARGETS,
+            "name": deck_names | {None},
+            "delete_used": (True, False),
+            "face_up": (True, False, None),
+        }
+        for key, value in request.items():
+            if key in check and value not in check[key]:
+                raise RoutineError(f"line {number}: {key}={value} is not valid")
+        if cmd == "target" and "name" not in request:
+            raise RoutineError(f"line {number}: target needs name=")
+
+        steps.append((offset, request))
+
+    return steps
+
+
+def load_routine(path, deck):
+    with open(path, encoding="utf-8") as f:
+        return compile_routine(f.read(), deck)
+
+
+class RoutinePlayer:
+    def __init__(self, widget, execute, steps):
+        self.widget = widget
+        self.execute = execute
+        self.steps = steps
+        self.index = 0
+        self.started = 0.0
+        self.job = None
+
+    def start(self):
+        self.stop()
+        self.index = 0
+        self.started = time.perf_counter()
+        self.schedule()
+
+    def stop(self):
+        if self.job:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def elapsed(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def schedule(self):
+        if self.index >= len(self.steps):
+            self.job = None
+            return
+
+        # Delays are taken from the start time, so late callbacks never drift.
+        delay = self.steps[self.index][0] - self.elapsed()
+        self.job = self.widget.after(max(0, int(delay)), self.fire)
+
+    def fire(self):
+        while self.index < len(self.steps):
+            offset, request = self.steps[self.index]
+            if offset > self.elapsed() + 1:
+                break
+            self.index += 1
+            try:
+                self.execute(request)
+            except ValueError as e:
+                log.warning("⚠️ Routine step %d failed: %s", self.index, e)
+        self.schedule()
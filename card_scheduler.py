@@ -0,0 +1,113 @@
+from card_log import log
+import sys, time, traceback
+
+MOTION, EFFECT = 0, 1
+FRAME_MS = 10
+BUDGET_MS = 8
+MIN_QUALITY = 0.25
+
+
+class FrameScheduler:
+    def __init__(
+        self,
+        widget,
+        frame_ms=FRAME_MS,
+        budget_ms=BUDGET_MS,
+        on_error=None,
+        on_frame=None,
+    ):
+        self.widget = widget
+        self.on_error = on_error or report
+        self.on_frame = on_frame
+        self.frame_ms = frame_ms
+        self.budget_ms = budget_ms
+        self.tasks = {MOTION: [], EFFECT: []}
+        self.quality = 1.0
+        self.job = None
+        self.due = 0.0
+        self.idle_since = None
+        self.ticking = False
+
+    def add(self, step, priority=MOTION, cancel=None):
+        # step() runs once per frame and returns True while it has more to do.
+        # cancel() runs instead of the step's own ending if the step raises,
+        # so its owner can clear the flags it set.
+        self.tasks[priority].append((step, cancel))
+        if self.job is None and not self.ticking:
+            self.recover()
+            self.schedule()
+
+    def recover(self):
+        # adapt() only runs while frames tick, so an idle scheduler would keep
+        # the quality a burst left behind. Credit the idle frames instead.
+        if self.idle_since is None:
+            return
+        idle_ms = (time.perf_counter() - self.idle_since) * 1000
+        self.quality = min(1.0, self.quality + 0.05 * idle_ms / self.frame_ms)
+        self.idle_since = None
+
+    def schedule(self):
+        self.due = time.perf_counter() + self.frame_ms / 1000
+        self.job = self.widget.after(self.frame_ms, self.tick)
+
+    def tick(self):
+        self.job = None
+        self.ticking = True
+        start = time.perf_counter()
+
+        # Card motion always runs. Effects share what is left of the budget,
+        # and the rest wait for the next frame.
+        motion, self.tasks[MOTION] = self.tasks[MOTION], []
+        ran = bool(motion)
+        self.tasks[MOTION] += [task for task in motion if self.run(*task)]
+
+        effects, self.tasks[EFFECT] = self.tasks[EFFECT], []
+        for i, task in enumerate(effects):
+            if (time.perf_counter() - start) * 1000 > self.budget_ms:
+                self.tasks[EFFECT] += effects[i:]
+                break
+            ran = True
+            if self.run(*task):
+                self.tasks[EFFECT].append(task)
+        self.ticking = False
+        if ran and self.on_frame:
+            self.on_frame()
+
+        spent = (time.perf_counter() - start) * 1000
+        late = max(0.0, (start - self.due) * 1000)
+        self.adapt(spent + late)
+        if self.tasks[MOTION] or self.tasks[EFFECT]:
+            self.schedule()
+        else:
+            self.idle_since = time.perf_counter()
+
+    def run(self, step, cancel=None):
+        # A failing step is dropped on its own; every other animation keeps
+        # running.
+        try:
+            return step()
+        except Exception:
+            self.on_error(*sys.exc_info())
+        if cancel:
+            try:
+                cancel()
+            except Exception:
+                self.on_error(*sys.exc_info())
+        return False
+
+    def adapt(self, load_ms):
+        # Time spent in this frame plus how late it started, which also
+        # counts the redraws and input handled since the last one.
+        if load_ms > self.budget_ms:
+            self.quality = max(MIN_QUALITY, self.quality * 0.8)
+        elif load_ms < self.budget_ms / 2:
+            self.quality = min(1.0, self.quality + 0.05)
+
+    @property
+    def pending(self):
+        return len(self.tasks[MOTION]) + len(self.tasks[EFFECT])
+
+
+def report(kind, value, trace):
+    text = "".join(traceback.format_exception(kind, value, trace))
+    log.error("🟥 Frame task failed: %s", text.rstrip())
@@ -0,0 +1,152 @@
+from card_deck import load_deck
+from card_remote import launch_overlay, stop_overlay
+import random, statistics, sys, time
+
+CYCLES = 2000
+SAMPLE_EVERY = 100
+WARMUP = 0.25
+# Allowed rise from the early samples to the late ones: (absolute, relative).
+DRIFT = {
+    "items": (2, 0),
+    "images": (2, 0),
+    "timers": (0, 0),
+    "blocks": (0, 0.05),
+    "frame_ms": (1, 0.5),
+}
+
+
+def random_action(client, rng, names):
+    roll = rng.random()
+    if roll < 0.15:
+        client.send("spawn")
+    elif roll < 0.3:
+        client.send(
+            "spread",
+            group=rng.choice(["all", "red", "black", "spade", "heart"]),
+            sort=rng.choice(["random", "standard", "si_stebbins", "color_mirror"]),
+            face_up=rng.choice([True, False, None]),
+        )
+    elif roll < 0.5:
+        client.send("flip", target="card", name=rng.choice(names))
+    elif roll < 0.6:
+        client.send("flip", target=rng.choice(["group", "all"]))
+    elif roll < 0.7:
+        client.send("target", name=rng.choice(names))
+    elif roll < 0.85:
+        client.send("delete", target="card", name=rng.choice(names))
+    elif roll < 0.93:
+        client.send("delete", target="group")
+    else:
+        client.send("reset")
+
+
+def settled_stats(client, timeout=15, reset=True):
+    # Let running spreads finish, clear the board, and wait for every
+    # animation timer to stop, so each sample is taken from the same empty
+    # state.
+    if reset:
+        settle(client, timeout)
+        client.send("reset")
+    return settle(client, timeout)
+
+
+def settle(client, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = client.send("stats")["result"]
+        if stats["timers"] == 0 or time.monotonic() > deadline:
+            return stats
+        time.sleep(0.25)
+
+
+def check_delete_group(client):
+    # Regression: deleting a whole spread used to strand every card after the
+    # first one on the board, with the delete chain never finishing.
+    client.send("reset")
+    client.send("spread", sort="standard")
+    time.sleep(4)
+    client.send("delete", target="group")
+    stats = settled_stats(client, reset=False)
+    failures = [
+        f"{key}={stats[key]} after deleting a group"
+        for key in ("cards", "pending", "orphans")
+        if stats[key]
+    ]
+    return failures
+
+
+def drifted(samples):
+    start = int(len(samples) * WARMUP)
+    early = samples[start : start + (len(samples) - start) // 3]
+    late = samples[len(samples) - (len(samples) - start) // 3 :]
+    failures = []
+    for metric, (absolute, relative) in DRIFT.items():
+        before = statistics.median(s[metric] for s in early)
+        after = statistics.median(s[metric] for s in late)
+        if after > before + absolute + before * relative:
+            failures.append(f"drift {metric}: {before:.2f} -> {after:.2f}")
+    return failures
+
+
+def soak(client, cycles=CYCLES, seed=0):
+    rng = random.Random(seed)
+    names = load_deck().names
+    samples = [settled_stats(client)]
+    rejected = 0
+    failures = []
+
+    for cycle in range(1, cycles + 1):
+        try:
+            random_action(client, rng, names)
+        except RuntimeError as e:
+            # A ValueError is a command refused on purpose (nothing to delete,
+            # a spread already running); anything else is a bug.
+            if str(e).startswith("ValueError"):
+                rejected += 1
+            else:
+                failures.append(f"cycle {cycle}: {e}")
+        time.sleep(rng.uniform(0.02, 0.15))
+
+        if cycle % SAMPLE_EVERY == 0:
+            samples.append(settled_stats(client))
+            s = samples[-1]
+            print(
+                f"{cycle:>6} items={s['items']} images={s['images']} "
+                f"timers={s['timers']} blocks={s['blocks']} "
+                f"frame={s['frame_ms']:.2f}ms rejected={rejected} "
+                f"errors={len(failures) + s['errors']}"
+            )
+            failures += inconsistent(s, cycle)
+    return samples, failures
+
+
+def inconsistent(stats, cycle):
+    # Taken after a reset has settled: the board must be empty and in step.
+    return [
+        f"cycle {cycle}: {key}={stats[key]} after reset"
+        for key in ("cards", "pending", "orphans")
+        if stats[key]
+    ]
+
+
+if __name__ == "__main__":
+    # python card_soak.py [cycles]   (starts Xvfb when DISPLAY is not set)
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else CYCLES
+    procs, client = launch_overlay()
+    try:
+        broken = check_delete_group(client)
+        samples, errors = soak(client, cycles)
+        callback_errors = client.send("stats")["result"]["errors"]
+    finally:
+        client.close()
+        stop_overlay(procs)
+
+    failures = drifted(samples) if len(samples) >= 4 else ["not enough samples"]
+    failures += broken + errors
+    if callback_errors:
+        failures.append(f"{callback_errors} exceptions in Tk callbacks (see log)")
+    for failure in failures:
+        print(f"🟥 {failure}")
+    if not failures:
+        print(f"🟩 no drift over {cycles} cycles")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,146 @@
+import functools, random
+
+SUIT_ORDER = ["spade", "diamond", "club", "heart"]
+SORTS = (
+    "random",
+    "standard",
+    "si_stebbins",
+    "eight_kings",
+    "color_mirror",
+    "number_mirror",
+    "color_number_mirror",
+)
+STACK_ORDERS = ("standard", "si_stebbins", "eight_kings")
+
+
+COLOR_MIRROR = {
+    "club": "spade",
+    "spade": "club",
+    "heart": "diamond",
+    "diamond": "heart",
+}
+
+
+def card_rank(deck, name):
+    return deck.rank.get(name, "")
+
+
+@functools.lru_cache(maxsize=None)
+def card_info(deck, name):
+    # Suit and rank come from the deck (the manifest's, when there is one),
+    # looked up once per name. Shoe copies ("#2") sort next to their original.
+    suit, rank = deck.suit[name], deck.rank[name]
+    number = int(rank) if rank.isdigit() else 0
+    base, _, copy = name.partition("#")
+    return suit, number, int(copy or 1), base
+
+
+def standard_stack(deck, name):
+    suit, number, copy, base = card_info(deck, name)
+    if suit == "joker":
+        first = base == deck.by_suit["joker"][0]
+        return (-1 if first else 99, number, copy)
+    if suit not in SUIT_ORDER:
+        return (len(SUIT_ORDER), suit, number, copy)
+    return (SUIT_ORDER.index(suit), number, copy)
+
+
+def si_stebbins_stack(deck, name):
+    suit, number, copy, _ = card_info(deck, name)
+    order = ["club", "heart", "spade", "diamond"]
+    if suit not in order:
+        return (99, 99, suit, copy)
+    suit = order.index(suit)
+    return ((14 - number + suit * 3) % 13, suit, "", copy)
+
+
+def eight_kings_stack(deck, name):
+    suit, number, copy, _ = card_info(deck, name)
+    suit_order = ["club", "heart", "spade", "diamond"]
+    number_order = [8, 13, 3, 10, 2, 7, 9, 5, 12, 4, 1, 6, 11]
+    if suit not in suit_order or number not in number_order:
+        return (99, 99, suit, copy)
+    rank = number_order.index(number)
+    new_suit = (suit_order.index(suit) - rank) % 4
+    return (new_suit, rank, "", copy)
+
+
+def mirror_of(deck, name, suit, rank):
+    # The card that pairs with name: the other colour of the same family
+    # and/or the rank that adds up to 14, from the same deck of a shoe.
+    card_suit, card_rank = deck.suit[name], deck.rank[name]
+    if card_suit == "joker":
+        others = [j for j in deck.by_suit["joker"] if j != name]
+    else:
+        if suit:
+            card_suit = COLOR_MIRROR.get(card_suit, card_suit)
+        if rank and card_rank.isdigit() and 1 <= int(card_rank) <= 13:
+            card_rank = str(14 - int(card_rank))
+        others = deck.names_of(
+            deck.masks.get(card_suit, 0) & deck.rank_masks.get(card_rank, 0)
+        )
+    copy = name.partition("#")[1:]
+    for other in others:
+        if other.partition("#")[1:] == copy:
+            return other
+    return None
+
+
+def mirror_stack(deck, available, suit, rank):
+    available = random.sample(available.copy(), len(available))
+    for i in range(len(available) // 2):
+        target = mirror_of(deck, available[i], suit, rank)
+        for j in range(i + 1, len(available)):
+            if available[j] == target:
+                available[j], available[len(available) // 2 + i] = (
+                    available[len(available) // 2 + i],
+                    available[j],
+                )
+                break
+    return available
+
+
+def order_cards(deck, available, sort):
+    if sort == "random":
+        return random.sample(available.copy(), len(available))
+    elif sort == "standard":
+        return sorted(available, key=functools.partial(standard_stack, deck))
+    elif sort == "si_stebbins":
+        return sorted(available, key=functools.partial(si_stebbins_stack, deck))
+    elif sort == "eight_kings":
+        return sorted(available, key=functools.partial(eight_kings_stack, deck))
+    elif sort == "color_mirror":
+        return mirror_stack(deck, available, True, False)
+    elif sort == "number_mirror":
+        return mirror_stack(deck, available, False, True)
+    elif sort == "color_number_mirror":
+        return mirror_stack(deck, available, True, True)
+    raise ValueError(f"invalid sort option: {sort}")
+
+
+class StackIndex:
+    def __init__(self, cards):
+        self.cards = list(cards)
+        self.positions = {name: i + 1 for i, name in enumerate(self.cards)}
+
+    def card_at(self, position):
+        if 1 <= position <= len(self.cards):
+            return self.cards[position - 1]
+        return None
+
+    def position_of(self, name):
+        return self.positions.get(name)
+
+
+def build_indexes(deck):
+    return {
+        sort: StackIndex(order_cards(deck, list(deck.names), sort))
+        for sort in STACK_ORDERS
+    }
+
+
+def rank_index(deck):
+    ranks = {}
+    for name in order_cards(deck, deck.names, "standard"):
+        ranks.setdefault(card_rank(deck, name), []).append(name)
+    return ranks